@@ -1,543 +1,3943 @@
-#!/usr/bin/env python3
-from pythonping import ping
-import statistics
-import argparse
-import sys
-import requests
-import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-def color(text, color):
-    colors = {
-        'red': '\033[91m',
-        'green': '\033[92m',
-        'yellow': '\033[93m',
-        'blue': '\033[94m',
-        'magenta': '\033[95m',
-        'cyan': '\033[96m'
-    }
-    return f"{colors.get(color, '')}{text}\033[0m"
-
-def fetch_cs2_servers(region='eu'):
-    """Récupère les serveurs CS2 depuis l'API Steam"""
-    region_name = "européens" if region == 'eu' else "américains"
-    print(f"🔄 Récupération des serveurs {region_name} depuis l'API Steam...")
-    
-    try:
-        url = "https://api.steampowered.com/ISteamApps/GetSDRConfig/v1/?appid=730"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        servers = {}
-        pops = data.get('pops', {})
-        
-        if region == 'eu':
-            # Codes des régions européennes
-            target_regions = [
-                'ams',    # Amsterdam
-                'fra',    # Frankfurt
-                'hel',    # Helsinki
-                'lhr',    # London
-                'mad',    # Madrid
-                'par',    # Paris
-                'sto',    # Stockholm
-                'vie',    # Vienna
-                'waw',    # Warsaw
-                'lux',    # Luxembourg
-                'mil',    # Milan
-                'ath',    # Athens
-                'bud',    # Budapest
-                'osl',    # Oslo
-                'cph',    # Copenhagen
-                'prg',    # Prague
-                'bru',    # Brussels
-                'zrh',    # Zurich
-                'rom',    # Rome
-                'dub',    # Dublin
-                'lis',    # Lisbon
-                'bcn',    # Barcelona
-            ]
-            
-            region_names = {
-                'ams': 'Amsterdam',
-                'fra': 'Frankfurt', 
-                'hel': 'Helsinki',
-                'lhr': 'London',
-                'mad': 'Madrid',
-                'par': 'Paris',
-                'sto': 'Stockholm',
-                'vie': 'Vienna',
-                'waw': 'Warsaw',
-                'lux': 'Luxembourg',
-                'mil': 'Milan',
-                'ath': 'Athens',
-                'bud': 'Budapest',
-                'osl': 'Oslo',
-                'cph': 'Copenhagen',
-                'prg': 'Prague',
-                'bru': 'Brussels',
-                'zrh': 'Zurich',
-                'rom': 'Rome',
-                'dub': 'Dublin',
-                'lis': 'Lisbon',
-                'bcn': 'Barcelona'
-            }
-        else:  # region == 'us'
-            # Codes des régions américaines
-            target_regions = [
-                'sea',    # Seattle
-                'lax',    # Los Angeles
-                'den',    # Denver
-                'dfw',    # Dallas
-                'ord',    # Chicago
-                'iad',    # Washington DC
-                'bos',    # Boston
-                'atl',    # Atlanta
-                'mia',    # Miami
-                'phx',    # Phoenix
-                'okc',    # Oklahoma City
-                'scl',    # Salt Lake City
-            ]
-            
-            region_names = {
-                'sea': 'Seattle',
-                'lax': 'Los Angeles',
-                'den': 'Denver',
-                'dfw': 'Dallas',
-                'ord': 'Chicago',
-                'iad': 'Washington DC',
-                'bos': 'Boston',
-                'atl': 'Atlanta',
-                'mia': 'Miami',
-                'phx': 'Phoenix',
-                'okc': 'Oklahoma City',
-                'scl': 'Salt Lake City'
-            }
-        
-        for pop_code, pop_data in pops.items():
-            #print(pop_data)
-            if pop_code.lower() in target_regions:
-                relay_addresses = pop_data.get('relays', [])
-                #print(relay_addresses)
-                if relay_addresses:
-                    for item in relay_addresses:
-                        #print(item.get('ipv4'))
-                        ip = item.get('ipv4')
-                        region_name = region_names.get(pop_code.lower(), pop_code.upper())
-                        servers[f"{region}-{pop_code.lower()}"] = {
-                            'ip': ip,
-                            'name': region_name,
-                            'code': pop_code.upper()
-                        }
-        
-        if servers:
-            print(f"\n{len(servers)} serveurs {region} trouvés")
-            return servers
-        else:
-            print(f"\nAucun serveur {region} trouvé, utilisation des serveurs par défaut")
-            return get_fallback_servers()
-            
-    except requests.RequestException as e:
-        print(f"❌ Erreur réseau: {e}")
-        print("🔄 Utilisation des serveurs par défaut...")
-        return get_fallback_servers()
-    except (KeyError, ValueError, json.JSONDecodeError) as e:
-        print(f"❌ Erreur parsing API: {e}")
-        print("🔄 Utilisation des serveurs par défaut...")
-        return get_fallback_servers()
-
-def get_fallback_servers():
-    """Serveurs EU de secours si l'API ne fonctionne pas"""
-    return {
-        "eu-west-1": {
-            'ip': "155.133.248.34",
-            'name': "West Europe 1",
-            'code': "EU-W1"
-        },
-        "eu-west-2": {
-            'ip': "155.133.248.50",
-            'name': "West Europe 2", 
-            'code': "EU-W2"
-        },
-        "eu-north-1": {
-            'ip': "146.66.155.34",
-            'name': "North Europe 1",
-            'code': "EU-N1"
-        },
-        "eu-north-2": {
-            'ip': "146.66.155.50",
-            'name': "North Europe 2",
-            'code': "EU-N2"
-        },
-        "eu-central-1": {
-            'ip': "146.66.158.34",
-            'name': "Central Europe 1",
-            'code': "EU-C1"
-        },
-        "eu-central-2": {
-            'ip': "146.66.158.50",
-            'name': "Central Europe 2",
-            'code': "EU-C2"
-        }
-    }
-
-def show_help():
-    """Aide détaillée"""
-    print("GUIDE PING & RÉSEAU")
-    print("=" * 60)
-    
-    print("\n🏓 PING (LATENCE)")
-    print("   • Temps pour envoyer une donnée au serveur")
-    print("   • < 15ms  : Excellent (pro level)")
-    print("   • < 25ms  : Très bon (matchmaking)")
-    print("   • < 35ms  : Correct mais désavantage aux peeks")
-    print("   • > 50ms  : Difficile (retard visible)")
-    print(color("   • Impact : Plus c'est bas, plus la réaction est rapide", 'yellow'))
-    
-    print("\n📦 PERTE DE PAQUETS")
-    print("   • % de données perdues en route")
-    print("   • 0%     : Parfait")
-    print("   • < 0.5% : Acceptable")
-    print("   • > 1%   : Hitreg défaillant (balles perdues)")
-    print(color("   • Impact : Certains tirs n'arrivent pas au serveur", 'yellow'))
-    
-    print("\n📈 JITTER (INSTABILITÉ)")
-    print("   • Variation de la latence")
-    print("   • < 5ms  : Stable")
-    print("   • < 10ms : Léger")
-    print("   • > 15ms : Aim perturbé")
-    print(color("   • Impact : Crosshair qui 'saute', aim incohérent", 'yellow'))
-    
-    print("\n⚡ PICS DE LATENCE")
-    print("   • Montées soudaines de ping")
-    print("   • Détection : > 3x l'écart-type")
-    print(color("   • Impact : Micro-freezes, joueurs qui se téléportent", 'yellow'))
-    
-    print("\n📊 PERCENTILES")
-    print("   • P95 : 95% des pings sont inférieurs")
-    print("   • P99 : 99% des pings sont inférieurs")
-    print(color("   • Impact : Montre la régularité de la connexion", 'yellow'))
-    
-    print("\n🎮 POURQUOI C'EST IMPORTANT DANS CS2:")
-    print("   • Peeker's advantage : +20ms = désavantage énorme")
-    print("   • Hitreg : perte de paquets = balles fantômes")
-    print("   • Spray control : jitter = pattern incohérent")
-    print("   • Flicks : pics de ping = aim qui lag")
-    
-    print("\n🔧 SETTINGS RECOMMANDÉS:")
-    print("   • rate 786432 (max bandwidth)")
-    print("   • cl_cmdrate 128 (envoi au serveur)")
-    print("   • cl_updaterate 128 (réception serveur)")
-    print("   • cl_interp_ratio 1 (interpolation min)")
-    
-    print("\n💡 UTILISATION DU SCRIPT:")
-    print("   python script.py --eu     # Lister tous les serveurs EU")
-    print("   python script.py --us     # Lister tous les serveurs US")
-    print("   python script.py -s IP    # Tester un serveur spécifique")
-    print("   python script.py -h       # Aide")
-    print("   python script.py          # Menu")
-
-def quick_ping_test(server_ip, samples=10):
-    """Test rapide pour --list"""
-    try:
-        responses = ping(server_ip, count=samples, timeout=2)
-        times = [resp.time_elapsed * 1000 for resp in responses if resp.success]
-        if times:
-            return statistics.mean(times), len(times)
-        return None, 0
-    except:
-        return None, 0
-
-def detailed_ping_test(server_ip, samples=500):
-    """Test complet pour analyse"""
-    try:
-        responses = ping(server_ip, count=samples, timeout=3)
-        times = [resp.time_elapsed * 1000 for resp in responses if resp.success]
-        
-        if not times:
-            return None
-        
-        # Statistiques
-        loss = (samples - len(times)) / samples * 100
-        avg = statistics.mean(times)
-        min_ping = min(times)
-        max_ping = max(times)
-        jitter = statistics.stdev(times) if len(times) > 1 else 0
-        
-        # Percentiles et pics
-        sorted_times = sorted(times)
-        p95 = sorted_times[int(0.95 * len(times))]
-        p99 = sorted_times[int(0.99 * len(times))]
-        spikes = len([t for t in times if t > avg + 3 * jitter])
-        
-        return {
-            'times': times,
-            'loss': loss,
-            'avg': avg,
-            'min': min_ping,
-            'max': max_ping,
-            'jitter': jitter,
-            'p95': p95,
-            'p99': p99,
-            'spikes': spikes,
-            'samples': len(times)
-        }
-    except Exception as e:
-        print(f"❌ Erreur: {e}")
-        return None
-
-def list_all_servers(servers, region='eu'):
-    """Test rapide des serveurs"""
-    region_name = "EUROPE" if region == 'eu' else "US"
-    print(f"\n🌍 SCAN SERVEURS {region_name} (Steam API)")
-    print("=" * 55)
-    
-    results = []
-    
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        future_to_server = {
-            executor.submit(quick_ping_test, server_data['ip']): (server_id, server_data) 
-            for server_id, server_data in servers.items()
-        }
-        
-        for future in as_completed(future_to_server):
-            server_id, server_data = future_to_server[future]
-            avg_ping, success_count = future.result()
-            
-            if avg_ping:
-                results.append((server_id, server_data, avg_ping, success_count))
-                status = "✅" if avg_ping < 35 else "⚠️" if avg_ping < 60 else "❌"
-                print(f"{status} {server_data['name']:<15} {server_data['ip']:<15} {avg_ping:5.0f}ms ({success_count}/10)")
-            else:
-                print(f"❌ {server_data['name']:<15} {server_data['ip']:<15} TIMEOUT")
-    
-    # Tri par ping croissant
-    results.sort(key=lambda x: x[2])
-    
-    if results:
-        print("\n🏆 CLASSEMENT")
-        for i, (server_id, server_data, avg_ping, _) in enumerate(results[:3], 1):
-            medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉"
-            print(f"{medal} {server_data['name']} - {avg_ping:.0f}ms")
-        
-        best_server = results[0]
-        print(f"\n💡 RECOMMANDATION: {best_server[1]['name']} ({best_server[2]:.0f}ms)")
-        print(f"   Commande: python {sys.argv[0]} -s {best_server[1]['ip']}")
-
-def analyze_results(data):
-    """Analyse des résultats"""
-    print(f"\n📊 RÉSULTATS")
-    print('-----------------------')
-    print(f"Perte        : {data['loss']:.1f}% ({data['samples']}/500)")
-    print(f"Ping moyen   : {data['avg']:.0f}ms")
-    print(f"Min / Max    : {data['min']:.0f} / {data['max']:.0f}ms")
-    print(f"Jitter       : {data['jitter']:.1f}ms")
-    print(f"95e percentile: {data['p95']:.0f}ms")
-    print(f"99e percentile: {data['p99']:.0f}ms")
-    print(f"Pics détectés: {data['spikes']}")
-    
-    # VERDICT CS2
-    print(f"\n🎯 VERDICT")
-    print('-----------------------')
-    
-    critical_issues = []
-    warnings = []
-    
-    if data['loss'] > 0.5:
-        critical_issues.append(f"Perte {data['loss']:.1f}% → hitreg défaillant")
-    if data['avg'] > 35:
-        critical_issues.append(f"Ping {data['avg']:.0f}ms → désavantage peek")
-    if data['max'] > 80:
-        critical_issues.append(f"Pic {data['max']:.0f}ms → freeze possible")
-    if data['jitter'] > 8:
-        critical_issues.append(f"Jitter {data['jitter']:.1f}ms → aim instable")
-    if data['p99'] > 60:
-        critical_issues.append(f"P99 {data['p99']:.0f}ms → lags réguliers")
-    if data['spikes'] > 2:
-        critical_issues.append(f"{data['spikes']} pics → micro-freezes")
-    
-    if data['avg'] > 25:
-        warnings.append("Ping élevé pour le compétitif")
-    if data['jitter'] > 5:
-        warnings.append("Micro-variations détectées")
-    if data['p95'] > 45:
-        warnings.append("Quelques ralentissements")
-    
-    if critical_issues:
-        for issue in critical_issues:
-            print(color(f"   • {issue}", 'yellow'))
-        print("\n🔧 ACTIONS:")
-        print('-----------------------')
-        print("   • Changer de serveur/région")
-        print("   • Vérifier rate/interp settings")
-        print("   • Tester connexion Ethernet")
-    elif warnings:
-        for warning in warnings:
-            print(f"   • {warning}")
-        print("\n💡 RECOMMANDATIONS:")
-        print('-----------------------')
-        print("   • Éviter les duels serrés")
-        print("   • Privilégier le jeu défensif")
-        if data['avg'] > 25:
-            print("   • Considérer un serveur plus proche")
-    else:
-        if data['avg'] <= 15:
-            print("   🏆 Ping excellent pour le pro play")
-        elif data['avg'] <= 25:
-            print("   🎯 Parfait pour le matchmaking")
-        print("   ⚡ Hitreg fiable • Peeks réactifs")
-    
-    # Analyse technique
-    print(f"\n⚙️  DÉTAILS TECHNIQUES")
-    print('-----------------------')
-    print(f"Variation max    : {data['max'] - data['min']:.0f}ms")
-    print(f"Stabilité        : {100 - (data['jitter']/data['avg']*100):.0f}%")
-    
-    # Grade CS2
-    if data['avg'] <= 5:
-        latency_grade = color("S+ (LAN-like)", 'green')
-    elif data['avg'] <= 15:
-        latency_grade = color("S (Pro level)", 'green')
-    elif data['avg'] <= 25:
-        latency_grade = color("A (Excellent)", 'green')
-    elif data['avg'] <= 35:
-        latency_grade = color("B (Correct)", 'yellow')
-    elif data['avg'] <= 50:
-        latency_grade = color("C (Difficile)", 'red')
-    else:
-        latency_grade = color("D (Injouable)", 'red')
-    
-    print(f"Grade        : {latency_grade}\n\n")
-
-def show_main_menu():
-    """Menu principal"""
-    print("\n\nCS2 NETWORK ANALYZER\n")
-    print("=" * 40)
-    print(color("\n1. 🌍 Lister les serveurs EU", 'yellow'))
-    print(color("2. 🌍 Lister les serveurs US", 'yellow'))
-    print(color("3. 📚 Guide réseau", 'yellow'))
-    print(color("4. 🎮 Tester un serveur spécifique", 'yellow'))
-    print(color("5. ❌ Quitter", 'red'))
-    
-    while True:
-        try:
-            choice = input("\nChoix (1-5): ").strip()
-            
-            if choice == "1":
-                servers = fetch_cs2_servers('eu')
-                list_all_servers(servers, 'eu')
-                break            
-            elif choice == "2":
-                servers = fetch_cs2_servers('us')
-                list_all_servers(servers, 'us')
-                break
-            elif choice == "3":
-                show_help()
-                break
-            elif choice == "4":
-                servers = fetch_cs2_servers('eu')
-                show_server_menu(servers)
-                break
-            elif choice == "5":
-                print("Au revoir !")
-                sys.exit(0)
-            else:
-                print(color("Choix invalide (1-5)", 'red'))
-        except KeyboardInterrupt:
-            print("\nAu revoir !")
-            break
-
-def show_server_menu(servers):
-    """Menu de sélection de serveur"""
-    print("\n🎮 SERVEURS DISPONIBLES:")
-    server_list = list(servers.items())
-    
-    for i, (server_id, server_data) in enumerate(server_list, 1):
-        print(f"{i:2}. {server_data['name']:<15} ({server_data['ip']})")
-    
-    print(f"{len(servers)+1:2}. IP personnalisée")
-    
-    while True:
-        try:
-            choice = input(f"\nChoisir un serveur (1-{len(servers)+1}): ").strip()
-            
-            if choice.isdigit():
-                choice_num = int(choice)
-                if 1 <= choice_num <= len(servers):
-                    server_id, server_data = server_list[choice_num - 1]
-                    run_detailed_test(server_data['name'], server_data['ip'])
-                    break
-                elif choice_num == len(servers) + 1:
-                    custom_ip = input("IP du serveur: ").strip()
-                    if custom_ip:
-                        run_detailed_test(f"Serveur personnalisé", custom_ip)
-                        break
-                    else:
-                        print(color("❌ IP invalide", 'red'))
-                else:
-                    print(f"❌ Choix invalide (1-{len(servers)+1})")
-            else:
-                print(f"❌ Entrez un nombre (1-{len(servers)+1})")
-        except KeyboardInterrupt:
-            print("\n👋 Retour au menu")
-            break
-
-def run_detailed_test(server_name, server_ip):
-    """Lance un test détaillé"""
-    print(f"\n Test du serveur → {server_name} ({server_ip})")
-    print("=" * 50)
-    
-    data = detailed_ping_test(server_ip)
-    
-    if data:
-        analyze_results(data)
-    else:
-        print(color("SERVEUR INACCESSIBLE", 'red'))
-
-def main():
-    parser = argparse.ArgumentParser(
-        description="Test de ping optimisé pour CS2",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
-Exemples d'utilisation:
-  python script.py              # Menu principal
-  python script.py --eu       # Liste des serveurs EU
-  python script.py --us       # Liste des serveurs US
-  python script.py -s 1.2.3.4   # Tester un serveur spécifique
-  python script.py -h           # Guide réseau
-        """
-    )
-    
-    parser.add_argument("-s", "--server", help="IP du serveur à tester")
-    parser.add_argument("--eu", action="store_true", help="Lister les serveurs EU")
-    parser.add_argument("--us", action="store_true", help="Lister les serveurs US")
-    
-    # Override help pour afficher notre guide
-    if len(sys.argv) > 1 and sys.argv[1] in ['-h', '--help']:
-        show_help()
-        return
-    
-    args = parser.parse_args()
-    
-    # Récupération des serveurs CS2
-    if args.eu:
-        servers = fetch_cs2_servers('eu')
-        list_all_servers(servers, 'eu')
-    elif args.us:
-        servers = fetch_cs2_servers('us')
-        list_all_servers(servers, 'us')
-    elif args.server:
-        run_detailed_test(f"Serveur personnalisé", args.server)
-    else:
-        show_main_menu()
-
-if __name__ == "__main__":
-    try:
-        main()
-    except KeyboardInterrupt:
-        print(color("\nTest interrompu", 'red'))
-    except Exception as e:
-        print(f"❌ ERREUR: {e}")
-        print("Vérifiez: connexion internet, pythonping et requests installés")
-        print("Installation: pip install pythonping requests")
\ No newline at end of file
+#!/usr/bin/env python3
+import statistics
+import argparse
+import sys
+import json
+import math
+import asyncio
+import bisect
+import os
+import socket
+import struct
+import threading
+import time
+from array import array
+from collections import deque
+from contextlib import asynccontextmanager
+
+def color(text, color):
+    colors = {
+        'red': '\033[91m',
+        'green': '\033[92m',
+        'yellow': '\033[93m',
+        'blue': '\033[94m',
+        'magenta': '\033[95m',
+        'cyan': '\033[96m'
+    }
+    return f"{colors.get(color, '')}{text}\033[0m"
+
+# File du flux NDJSON : au-delà, les événements sont perdus (et comptés)
+# plutôt que de retarder les probes ; attente maximale de la fermeture (s)
+NDJSON_QUEUE_MAX = 65536
+NDJSON_CLOSE_TIMEOUT = 5.0
+
+class NdjsonWriter:
+    """Flux d'événements NDJSON (une ligne JSON par événement).
+
+    `emit` ne fait que mettre le dict en file : la sérialisation et
+    l'écriture se font dans un thread, par lots, si bien qu'un lecteur lent
+    (ou un tube plein) ne retarde jamais l'envoi des probes. La file est
+    bornée : un événement qui déborde est perdu, le total est publié en fin
+    de flux (événement 'dropped').
+    """
+
+    def __init__(self, stream, maxsize=NDJSON_QUEUE_MAX):
+        import queue
+        self.stream = stream
+        self.queue = queue.Queue(maxsize)
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+
+    def emit(self, event):
+        import queue
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _writer(self):
+        import queue
+        while True:
+            batch = [self.queue.get()]
+            try:
+                while len(batch) < 1024:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            done = batch[-1] is None
+            lines = [json.dumps(event, separators=(',', ':')) for event in batch if event is not None]
+            if done and self.dropped:
+                lines.append(json.dumps({'type': 'dropped', 'ts': time.time(), 'count': self.dropped},
+                                        separators=(',', ':')))
+            try:
+                if lines:
+                    self.stream.write('\n'.join(lines) + '\n')
+                    self.stream.flush()
+            except (OSError, ValueError):
+                return  # Lecteur parti : les événements suivants sont perdus
+            if done:
+                return
+
+    def close(self, timeout=NDJSON_CLOSE_TIMEOUT):
+        """Vide la file ; abandonne au bout de `timeout` si le lecteur est bloqué"""
+        import queue
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout)
+
+class EventQueue:
+    """Flux NDJSON d'un processus de scan : les événements remontent au
+    parent par une file multiprocessing (perdus si elle déborde)"""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def emit(self, event):
+        import queue
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            pass
+
+# Flux NDJSON actif (--ndjson), None en sortie texte
+EVENTS = None
+
+def emit(event_type, **fields):
+    """Publie un événement sur le flux NDJSON s'il est actif"""
+    if EVENTS:
+        EVENTS.emit({'type': event_type, 'ts': time.time(), **fields})
+
+# Auto-diagnostic actif (--self-profile), None sinon
+PROFILE = None
+
+# Au-delà (ms), la machine ajoute elle-même du bruit aux mesures
+SELF_PROFILE_LIMITS = {'sched': 1.0, 'wake': 1.0, 'gc': 2.0, 'pause': 5.0}
+SELF_PROFILE_TICK = 0.002   # Sommeil du fil sentinelle (s)
+# Horloges dont le RTT ne dépend pas du réveil de la boucle (horodatage à l'arrivée)
+WAKE_IMMUNE_CLOCKS = ('kernel', 'kernel-rx', 'sim')
+
+class SelfProfile:
+    """Ce que lagtest coûte lui-même pendant une série de probes.
+
+    Par probe : retard de l'ordonnanceur sur l'échéance, durée de l'appel
+    d'envoi et délai de réveil (arrivée de la réponse selon l'horloge du
+    RTT → reprise de la probe). En parallèle : pauses du ramasse-miettes
+    (gc.callbacks) et pauses de l'interpréteur vues par un fil sentinelle
+    qui mesure son retard au réveil (GIL tenu, processus désordonnancé).
+    L'enregistrement se limite à des array.append.
+    """
+
+    def __init__(self):
+        self.sched = array('d')    # ms
+        self.send = array('d')     # µs
+        self.wake = array('d')     # ms
+        self.gc = array('d')       # ms
+        self.pauses = array('d')   # ms
+        self.immune = 0            # Réveils sans effet sur le RTT (WAKE_IMMUNE_CLOCKS)
+        self.gc_start = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def record_sched(self, deadline):
+        self.sched.append((time.perf_counter() - deadline) * 1000)
+
+    def record_send(self, before):
+        self.send.append((time.perf_counter() - before) * 1e6)
+
+    def record_wake(self, send_time, rtt, clock=None):
+        self.wake.append((time.perf_counter() - send_time) * 1000 - rtt)
+        if clock in WAKE_IMMUNE_CLOCKS:
+            self.immune += 1
+
+    def on_gc(self, phase, info):
+        if phase == 'start':
+            self.gc_start = time.perf_counter()
+        elif self.gc_start is not None:
+            self.gc.append((time.perf_counter() - self.gc_start) * 1000)
+            self.gc_start = None
+
+    def watch(self):
+        while not self.stopping.is_set():
+            before = time.perf_counter()
+            time.sleep(SELF_PROFILE_TICK)
+            late = (time.perf_counter() - before - SELF_PROFILE_TICK) * 1000
+            if late > 1:
+                self.pauses.append(late)
+
+    def start(self):
+        """Nouvelle session : séries remises à zéro, GC et sentinelle suivis"""
+        import gc
+        for series in (self.sched, self.send, self.wake, self.gc, self.pauses):
+            del series[:]
+        self.immune = 0
+        gc.callbacks.append(self.on_gc)
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.watch, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        import gc
+        if self.on_gc in gc.callbacks:
+            gc.callbacks.remove(self.on_gc)
+        self.stopping.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def summary(self):
+        """Médiane/P99/max par série, nombre et durée des pauses"""
+        def spread(values):
+            ordered = sorted(values)
+            if not ordered:
+                return {'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+            n = len(ordered)
+            return {'p50': ordered[n // 2], 'p99': ordered[min(int(0.99 * n), n - 1)], 'max': ordered[-1]}
+        return {
+            'probes': len(self.send),
+            'sched_ms': spread(self.sched),
+            'send_us': spread(self.send),
+            'wake_ms': spread(self.wake),
+            # Jitter que le réveil ajouterait à un RTT horodaté en espace utilisateur
+            'noise_ms': statistics.stdev(self.wake) if len(self.wake) > 1 else 0.0,
+            # Part des RTT horodatés à l'arrivée : le réveil ne les touche pas
+            'wake_immune': self.immune / len(self.wake) if self.wake else 0.0,
+            'gc': {'count': len(self.gc), 'total_ms': sum(self.gc), 'max_ms': max(self.gc, default=0.0)},
+            'pauses': {'count': len(self.pauses), 'max_ms': max(self.pauses, default=0.0)},
+        }
+
+def self_profile_verdict(profile):
+    """(problèmes, niveau) : 0 apte, 1 mesure bruitée, 2 mesure faussée.
+
+    Le réveil n'est jugé que si la plupart des RTT sont horodatés en
+    espace utilisateur : sinon il ne s'ajoute pas au jitter mesuré.
+    """
+    checks = [
+        (profile['sched_ms']['p99'], 'sched', "Retard d'ordonnancement P99 {:.2f}ms"),
+        (profile['gc']['max_ms'], 'gc', "Pause GC {:.1f}ms"),
+        (profile['pauses']['max_ms'], 'pause', "Pause interpréteur {:.1f}ms"),
+    ]
+    if profile.get('wake_immune', 0) * 2 <= 1:
+        checks.insert(1, (profile['wake_ms']['p99'], 'wake', "Réveil P99 {:.2f}ms"))
+    issues, level = [], 0
+    for value, key, label in checks:
+        if value > SELF_PROFILE_LIMITS[key]:
+            issues.append(label.format(value))
+            level = max(level, 2 if value > 4 * SELF_PROFILE_LIMITS[key] else 1)
+    return issues, level
+
+def print_self_profile(profile, data=None):
+    """Section AUTO-DIAGNOSTIC : bruit ajouté par la machine et lagtest"""
+    print("\n🩺 AUTO-DIAGNOSTIC")
+    print('-----------------------')
+    sched, send, wake = profile['sched_ms'], profile['send_us'], profile['wake_ms']
+    print(f"Ordonnanceur     : retard méd {sched['p50']:.2f}ms, P99 {sched['p99']:.2f}ms, max {sched['max']:.2f}ms")
+    print(f"Appel d'envoi    : méd {send['p50']:.0f}µs, P99 {send['p99']:.0f}µs, max {send['max']:.0f}µs")
+    print(f"Réveil réception : méd {wake['p50']:.2f}ms, P99 {wake['p99']:.2f}ms, max {wake['max']:.2f}ms")
+    print(f"Ramasse-miettes  : {profile['gc']['count']} passes, {profile['gc']['total_ms']:.1f}ms "
+          f"(max {profile['gc']['max_ms']:.1f}ms)")
+    print(f"Pauses interpr.  : {profile['pauses']['count']} > 1ms (max {profile['pauses']['max_ms']:.1f}ms)")
+    if profile.get('wake_immune', 0) * 2 > 1:
+        print(f"Bruit propre     : {profile['noise_ms']:.2f}ms (hors RTT : horodatage à l'arrivée)")
+    elif data and data.get('jitter'):
+        print(f"Bruit propre     : {profile['noise_ms']:.2f}ms "
+              f"({profile['noise_ms'] / data['jitter'] * 100:.0f}% du jitter mesuré)")
+    else:
+        print(f"Bruit propre     : {profile['noise_ms']:.2f}ms")
+    
+    issues, level = self_profile_verdict(profile)
+    for issue in issues:
+        print(color(f"   • {issue}", 'yellow'))
+    verdict = ["✅ Machine apte à mesurer", "⚠️ Mesures bruitées par la machine",
+               "❌ Machine inapte : cadence d'envoi faussée par la machine" if profile.get('wake_immune', 0) * 2 > 1
+               else "❌ Machine inapte : une partie du jitter vient de lagtest"][level]
+    print(color(verdict, ['green', 'yellow', 'red'][level]))
+
+SDR_APPID = 730
+SDR_CONFIG_URL = "https://api.steampowered.com/ISteamApps/GetSDRConfig/v1/?appid={appid}"
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'cs2_lagtest')
+SDR_CACHE_TTL = 3600            # Copie fraîche : utilisée sans réseau
+SDR_CACHE_MAX_STALE = 7 * 86400 # Copie périmée : utilisée, rafraîchie en arrière-plan
+
+def sdr_cache_path(appid=SDR_APPID):
+    return os.path.join(CACHE_DIR, f"sdr_config_{appid}.json")
+
+def load_sdr_cache(appid=SDR_APPID):
+    """Dernière copie connue de l'annuaire des relais (None si absente/corrompue)"""
+    try:
+        with open(sdr_cache_path(appid), encoding='utf-8') as f:
+            entry = json.load(f)
+        if entry.get('appid') == appid and isinstance(entry.get('pops'), dict):
+            return entry
+    except (OSError, ValueError):
+        pass
+    return None
+
+def save_sdr_cache(entry):
+    """Écriture atomique pour ne jamais laisser un cache à moitié écrit"""
+    path = sdr_cache_path(entry['appid'])
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+def sdr_entry(data, appid=SDR_APPID):
+    """Ne garde de la réponse GetSDRConfig que l'annuaire des POPs"""
+    pops = data.get('pops')
+    if not isinstance(pops, dict):
+        raise ValueError("réponse GetSDRConfig sans 'pops'")
+    return {
+        'appid': appid,
+        'revision': data.get('revision'),
+        'fetched_at': time.time(),
+        'pops': pops
+    }
+
+def download_sdr_config(appid=SDR_APPID, cached=None):
+    """Télécharge la config SDR et met le cache à jour"""
+    import requests  # Import paresseux : inutile quand le cache suffit
+    response = requests.get(SDR_CONFIG_URL.format(appid=appid), timeout=10)
+    response.raise_for_status()
+    data = response.json()
+
+    if cached and data.get('revision') is not None and data.get('revision') == cached.get('revision'):
+        # Même révision : on prolonge la copie existante
+        entry = dict(cached, fetched_at=time.time())
+    else:
+        entry = sdr_entry(data, appid)
+    save_sdr_cache(entry)
+    return entry
+
+def revalidate_sdr_config(appid, cached):
+    try:
+        download_sdr_config(appid, cached)
+    except Exception:
+        pass  # La copie actuelle reste utilisable
+
+def get_sdr_config(appid=SDR_APPID, config_file=None, refresh=False):
+    """Annuaire des relais : fichier fourni, cache frais, cache périmé ou API.
+
+    Une copie périmée est servie immédiatement et revalidée en arrière-plan
+    (stale-while-revalidate). Si l'API est injoignable, la dernière copie
+    connue est utilisée quel que soit son âge.
+    """
+    if config_file:
+        with open(config_file, encoding='utf-8') as f:
+            return sdr_entry(json.load(f), appid)
+
+    cached = None if refresh else load_sdr_cache(appid)
+    if cached:
+        age = time.time() - cached.get('fetched_at', 0)
+        if age < SDR_CACHE_TTL:
+            return cached
+        if age < SDR_CACHE_MAX_STALE:
+            threading.Thread(target=revalidate_sdr_config, args=(appid, cached), daemon=True).start()
+            return cached
+
+    try:
+        return download_sdr_config(appid, cached or load_sdr_cache(appid))
+    except (OSError, ValueError):
+        offline = cached or load_sdr_cache(appid)
+        if offline:
+            print(color("⚠️  API Steam injoignable, utilisation de la dernière config connue", 'yellow'))
+            return offline
+        raise
+
+def fetch_cs2_servers(region='eu', config_file=None, refresh=False):
+    """Récupère les serveurs CS2 depuis l'API Steam"""
+    region_name = {'eu': "européens", 'us': "américains"}.get(region, "du monde entier")
+    print(f"🔄 Récupération des serveurs {region_name} depuis l'API Steam...")
+    
+    try:
+        servers = {}
+        pops = get_sdr_config(config_file=config_file, refresh=refresh)['pops']
+        
+        if region == 'eu':
+            # Codes des régions européennes
+            target_regions = [
+                'ams',    # Amsterdam
+                'fra',    # Frankfurt
+                'hel',    # Helsinki
+                'lhr',    # London
+                'mad',    # Madrid
+                'par',    # Paris
+                'sto',    # Stockholm
+                'vie',    # Vienna
+                'waw',    # Warsaw
+                'lux',    # Luxembourg
+                'mil',    # Milan
+                'ath',    # Athens
+                'bud',    # Budapest
+                'osl',    # Oslo
+                'cph',    # Copenhagen
+                'prg',    # Prague
+                'bru',    # Brussels
+                'zrh',    # Zurich
+                'rom',    # Rome
+                'dub',    # Dublin
+                'lis',    # Lisbon
+                'bcn',    # Barcelona
+            ]
+            
+            region_names = {
+                'ams': 'Amsterdam',
+                'fra': 'Frankfurt', 
+                'hel': 'Helsinki',
+                'lhr': 'London',
+                'mad': 'Madrid',
+                'par': 'Paris',
+                'sto': 'Stockholm',
+                'vie': 'Vienna',
+                'waw': 'Warsaw',
+                'lux': 'Luxembourg',
+                'mil': 'Milan',
+                'ath': 'Athens',
+                'bud': 'Budapest',
+                'osl': 'Oslo',
+                'cph': 'Copenhagen',
+                'prg': 'Prague',
+                'bru': 'Brussels',
+                'zrh': 'Zurich',
+                'rom': 'Rome',
+                'dub': 'Dublin',
+                'lis': 'Lisbon',
+                'bcn': 'Barcelona'
+            }
+        elif region == 'us':
+            # Codes des régions américaines
+            target_regions = [
+                'sea',    # Seattle
+                'lax',    # Los Angeles
+                'den',    # Denver
+                'dfw',    # Dallas
+                'ord',    # Chicago
+                'iad',    # Washington DC
+                'bos',    # Boston
+                'atl',    # Atlanta
+                'mia',    # Miami
+                'phx',    # Phoenix
+                'okc',    # Oklahoma City
+                'scl',    # Salt Lake City
+            ]
+            
+            region_names = {
+                'sea': 'Seattle',
+                'lax': 'Los Angeles',
+                'den': 'Denver',
+                'dfw': 'Dallas',
+                'ord': 'Chicago',
+                'iad': 'Washington DC',
+                'bos': 'Boston',
+                'atl': 'Atlanta',
+                'mia': 'Miami',
+                'phx': 'Phoenix',
+                'okc': 'Oklahoma City',
+                'scl': 'Salt Lake City'
+            }
+        
+        else:  # region == 'world'
+            # Tous les POPs de la config SDR (Asie, Amérique du Sud, Océanie...)
+            target_regions = [pop_code.lower() for pop_code in pops]
+            region_names = {}
+        
+        for pop_code, pop_data in pops.items():
+            #print(pop_data)
+            if pop_code.lower() in target_regions:
+                relay_addresses = pop_data.get('relays', [])
+                relays = [item['ipv4'] for item in relay_addresses if item.get('ipv4')]
+                for item in relay_addresses:
+                    if item.get('ipv4') and item.get('port_range'):
+                        RELAY_PORTS[item['ipv4']] = item['port_range'][0]
+                if relays:
+                    # Tous les relais du POP sont gardés (et testés)
+                    region_name = region_names.get(pop_code.lower(), pop_data.get('desc') or pop_code.upper())
+                    servers[f"{region}-{pop_code.lower()}"] = {
+                        'ip': relays[0],
+                        'name': region_name,
+                        'code': pop_code.upper(),
+                        'relays': relays,
+                        'geo': pop_data.get('geo')  # [longitude, latitude]
+                    }
+        
+        if servers:
+            relay_count = sum(len(server['relays']) for server in servers.values())
+            print(f"\n{len(servers)} serveurs {region} trouvés ({relay_count} relais)")
+            return servers
+        else:
+            print(f"\nAucun serveur {region} trouvé, utilisation des serveurs par défaut")
+            return get_fallback_servers()
+            
+    except OSError as e:
+        # requests.RequestException dérive d'OSError
+        print(f"❌ Erreur réseau: {e}")
+        print("🔄 Utilisation des serveurs par défaut...")
+        return get_fallback_servers()
+    except (KeyError, ValueError, json.JSONDecodeError) as e:
+        print(f"❌ Erreur parsing API: {e}")
+        print("🔄 Utilisation des serveurs par défaut...")
+        return get_fallback_servers()
+
+def get_fallback_servers():
+    """Serveurs EU de secours si l'API ne fonctionne pas"""
+    return {
+        "eu-west-1": {
+            'ip': "155.133.248.34",
+            'name': "West Europe 1",
+            'code': "EU-W1"
+        },
+        "eu-west-2": {
+            'ip': "155.133.248.50",
+            'name': "West Europe 2", 
+            'code': "EU-W2"
+        },
+        "eu-north-1": {
+            'ip': "146.66.155.34",
+            'name': "North Europe 1",
+            'code': "EU-N1"
+        },
+        "eu-north-2": {
+            'ip': "146.66.155.50",
+            'name': "North Europe 2",
+            'code': "EU-N2"
+        },
+        "eu-central-1": {
+            'ip': "146.66.158.34",
+            'name': "Central Europe 1",
+            'code': "EU-C1"
+        },
+        "eu-central-2": {
+            'ip': "146.66.158.50",
+            'name': "Central Europe 2",
+            'code': "EU-C2"
+        }
+    }
+
+def show_help():
+    """Aide détaillée"""
+    print("GUIDE PING & RÉSEAU")
+    print("=" * 60)
+    
+    print("\n🏓 PING (LATENCE)")
+    print("   • Temps pour envoyer une donnée au serveur")
+    print("   • < 15ms  : Excellent (pro level)")
+    print("   • < 25ms  : Très bon (matchmaking)")
+    print("   • < 35ms  : Correct mais désavantage aux peeks")
+    print("   • > 50ms  : Difficile (retard visible)")
+    print(color("   • Impact : Plus c'est bas, plus la réaction est rapide", 'yellow'))
+    
+    print("\n📦 PERTE DE PAQUETS")
+    print("   • % de données perdues en route")
+    print("   • 0%     : Parfait")
+    print("   • < 0.5% : Acceptable")
+    print("   • > 1%   : Hitreg défaillant (balles perdues)")
+    print(color("   • Impact : Certains tirs n'arrivent pas au serveur", 'yellow'))
+    
+    print("\n📈 JITTER (INSTABILITÉ)")
+    print("   • Variation de la latence")
+    print("   • < 5ms  : Stable")
+    print("   • < 10ms : Léger")
+    print("   • > 15ms : Aim perturbé")
+    print(color("   • Impact : Crosshair qui 'saute', aim incohérent", 'yellow'))
+    
+    print("\n⚡ PICS DE LATENCE")
+    print("   • Montées soudaines de ping")
+    print("   • Détection : > 3x l'écart-type")
+    print(color("   • Impact : Micro-freezes, joueurs qui se téléportent", 'yellow'))
+    
+    print("\n📊 PERCENTILES")
+    print("   • P95 : 95% des pings sont inférieurs")
+    print("   • P99 : 99% des pings sont inférieurs")
+    print(color("   • Impact : Montre la régularité de la connexion", 'yellow'))
+    
+    print("\n🎮 POURQUOI C'EST IMPORTANT DANS CS2:")
+    print("   • Peeker's advantage : +20ms = désavantage énorme")
+    print("   • Hitreg : perte de paquets = balles fantômes")
+    print("   • Spray control : jitter = pattern incohérent")
+    print("   • Flicks : pics de ping = aim qui lag")
+    
+    print("\n🔧 SETTINGS RECOMMANDÉS:")
+    print("   • rate 786432 (max bandwidth)")
+    print("   • cl_cmdrate 128 (envoi au serveur)")
+    print("   • cl_updaterate 128 (réception serveur)")
+    print("   • cl_interp_ratio 1 (interpolation min)")
+    
+    print("\n💡 UTILISATION DU SCRIPT:")
+    print("   python script.py --eu     # Lister tous les serveurs EU")
+    print("   python script.py --us     # Lister tous les serveurs US")
+    print("   python script.py --world  # Scanner tous les POPs du monde")
+    print("   python script.py --path IP # Localiser le saut qui dégrade la connexion")
+    print("   python script.py -s IP    # Tester un serveur spécifique")
+    print("   python script.py -h       # Aide")
+    print("   python script.py          # Menu")
+
+class LatencySketch:
+    """Sketch de quantiles à erreur relative bornée (type DDSketch).
+
+    Les RTT sont rangés dans des paliers logarithmiques de largeur
+    `alpha` : la mémoire dépend de l'étendue des valeurs (~1400 paliers
+    de 10µs à 10s), jamais du nombre d'échantillons.
+    """
+
+    def __init__(self, alpha=0.01):
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.count = 0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def add(self, x):
+        key = math.ceil(math.log(x if x > 1e-6 else 1e-6) / self.log_gamma)
+        buckets = self.buckets
+        buckets[key] = buckets.get(key, 0) + 1
+        self.count += 1
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def quantile(self, p):
+        """Même rang que sorted(times)[int(p * n)]"""
+        if not self.count:
+            return 0
+        rank = min(int(p * self.count), self.count - 1)
+        seen = 0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+class StreamingStats:
+    """Statistiques de ping incrémentales en mémoire constante.
+
+    Moyenne/écart-type par Welford, min/max, perte, P95/P99 par sketch
+    logarithmique et pics détectés en ligne (> moyenne + 3σ des
+    échantillons précédents, et au moins SPIKE_FLOOR au-dessus).
+    """
+
+    # Échantillons nécessaires avant de juger un pic
+    SPIKE_WARMUP = 20
+    # Écart minimal (ms) : sur un lien quasi parfait, 3σ tombe sous la milliseconde
+    SPIKE_FLOOR = 5.0
+
+    def __init__(self):
+        self.sent = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.spikes = 0
+        self.sketch = LatencySketch()
+
+    def add(self, rtt):
+        """Ajoute un échantillon (None = paquet perdu)"""
+        self.sent += 1
+        if rtt is None:
+            return
+        count, mean = self.count, self.mean
+        if count >= self.SPIKE_WARMUP and rtt > mean + max(3 * (self.m2 / (count - 1)) ** 0.5,
+                                                           self.SPIKE_FLOOR):
+            self.spikes += 1
+
+        count += 1
+        delta = rtt - mean
+        mean += delta / count
+        self.m2 += delta * (rtt - mean)
+        self.count, self.mean = count, mean
+        self.sketch.add(rtt)
+
+    @property
+    def stdev(self):
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0
+
+    @property
+    def loss(self):
+        return (self.sent - self.count) / self.sent * 100 if self.sent else 0
+
+    def to_dict(self):
+        """Même format que detailed_ping_test (sans la liste des temps)"""
+        return {
+            'loss': self.loss,
+            'avg': self.mean,
+            'min': self.sketch.min,
+            'max': self.sketch.max,
+            'jitter': self.stdev,
+            'p95': self.sketch.quantile(0.95),
+            'p99': self.sketch.quantile(0.99),
+            'spikes': self.spikes,
+            'samples': self.count,
+            'sent': self.sent
+        }
+
+class SortedBlocks:
+    """Liste triée découpée en blocs bornés (façon sortedcontainers).
+
+    Insertion et suppression : bisection sur les maxima des blocs
+    (O(log n)) puis dans un bloc d'au plus 2 × LOAD valeurs, décalé en C.
+    L'accès par rang part de la fin : P95/P99 ne parcourent que les
+    derniers blocs.
+    """
+
+    LOAD = 64
+
+    def __init__(self):
+        self.blocks = []
+        self.maxes = []
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, value):
+        blocks, maxes = self.blocks, self.maxes
+        if not blocks:
+            blocks.append([value])
+            maxes.append(value)
+        else:
+            i = min(bisect.bisect_left(maxes, value), len(maxes) - 1)
+            block = blocks[i]
+            bisect.insort(block, value)
+            maxes[i] = block[-1]
+            if len(block) > 2 * self.LOAD:
+                blocks[i:i + 1] = [block[:self.LOAD], block[self.LOAD:]]
+                maxes[i:i + 1] = [block[self.LOAD - 1], block[-1]]
+        self.size += 1
+
+    def remove(self, value):
+        i = bisect.bisect_left(self.maxes, value)
+        block = self.blocks[i] if i < len(self.blocks) else []
+        j = bisect.bisect_left(block, value)
+        if j == len(block) or block[j] != value:
+            raise KeyError(value)
+        del block[j]
+        if block:
+            self.maxes[i] = block[-1]
+        else:
+            del self.blocks[i], self.maxes[i]
+        self.size -= 1
+
+    def __getitem__(self, rank):
+        if not 0 <= rank < self.size:
+            raise IndexError(rank)
+        from_end = self.size - 1 - rank
+        for block in reversed(self.blocks):
+            if from_end < len(block):
+                return block[-1 - from_end]
+            from_end -= len(block)
+
+# Fenêtres glissantes (secondes) : une dégradation de quelques secondes
+# disparaît dans les stats globales d'un long run
+WINDOW_SPANS = (1, 10, 60)
+
+class SlidingWindow:
+    """Jitter, P95/P99, max et perte des `span` dernières secondes.
+
+    Somme et somme des carrés pour le jitter, liste triée par blocs pour
+    les percentiles et deque monotone pour le max : O(log n) amorti par
+    échantillon. Dès que la fenêtre est pleine, chaque position est
+    comparée à la pire vue (P99 puis jitter), gardée avec son instant.
+    """
+
+    def __init__(self, span):
+        self.span = span
+        self.samples = deque()   # (seq, t, rtt)
+        self.maxima = deque()    # (seq, rtt) à RTT décroissants
+        self.sorted = SortedBlocks()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.lost = 0
+        self.seq = 0
+        self.start = None
+        self.last = None
+        self.worst = None
+
+    def add(self, t, rtt):
+        """Échantillon envoyé à l'instant t (s). Une perte, constatée au
+        timeout, arrive en retard : elle est datée du dernier échantillon"""
+        if self.start is None:
+            self.start = t
+        t = self.last = t if self.last is None else max(t, self.last)
+        self.seq += 1
+        self.samples.append((self.seq, t, rtt))
+        if rtt is None:
+            self.lost += 1
+        else:
+            self.total += rtt
+            self.total_sq += rtt * rtt
+            self.sorted.insert(rtt)
+            while self.maxima and self.maxima[-1][1] <= rtt:
+                self.maxima.pop()
+            self.maxima.append((self.seq, rtt))
+
+        while self.samples[0][1] <= t - self.span:
+            seq, _, old = self.samples.popleft()
+            if old is None:
+                self.lost -= 1
+                continue
+            self.total -= old
+            self.total_sq -= old * old
+            self.sorted.remove(old)
+            if self.maxima[0][0] == seq:
+                self.maxima.popleft()
+
+        n = self.sorted.size
+        if t - self.start >= self.span and n:
+            # Stats complètes seulement si le P99 peut détrôner la pire fenêtre
+            if self.worst is None or self.sorted[min(int(0.99 * n), n - 1)] >= self.worst['p99']:
+                current = self.current()
+                if self.worst is None or (current['p99'], current['jitter']) > (self.worst['p99'], self.worst['jitter']):
+                    self.worst = dict(current, t=t)
+
+    def current(self):
+        """Stats de la fenêtre (rangs des percentiles comme LatencySketch)"""
+        n = len(self.sorted)
+        variance = (self.total_sq - self.total * self.total / n) / (n - 1) if n > 1 else 0
+        return {
+            'jitter': max(variance, 0) ** 0.5,
+            'p95': self.sorted[min(int(0.95 * n), n - 1)],
+            'p99': self.sorted[min(int(0.99 * n), n - 1)],
+            'max': self.maxima[0][1],
+            'loss': self.lost / (n + self.lost) * 100,
+        }
+
+# Grades CS2 selon le ping moyen : (borne haute incluse, libellé, couleur)
+LATENCY_GRADES = [
+    (5, "S+ (LAN-like)", 'green'),
+    (15, "S (Pro level)", 'green'),
+    (25, "A (Excellent)", 'green'),
+    (35, "B (Correct)", 'yellow'),
+    (50, "C (Difficile)", 'red'),
+    (math.inf, "D (Injouable)", 'red'),
+]
+
+def latency_grade(avg):
+    """Indice dans LATENCY_GRADES"""
+    return next(i for i, (limit, _, _) in enumerate(LATENCY_GRADES) if avg <= limit)
+
+def batch_stats(runs, backend=None):
+    """Stats (format detailed_ping_test + 'grade') de plusieurs runs d'un coup.
+
+    Chaque run est une séquence de RTT (NaN ou None = perte). Le backend
+    'numpy' traite tous les runs comme une seule matrice ; 'python' rejoue
+    chaque run dans StreamingStats. Par défaut NumPy s'il est installé.
+    """
+    if backend is None:
+        try:
+            import numpy  # noqa: F401
+            backend = 'numpy'
+        except ImportError:
+            backend = 'python'
+    if backend == 'numpy':
+        return batch_stats_numpy(runs)
+
+    results = []
+    for run in runs:
+        stats = StreamingStats()
+        for rtt in run:
+            stats.add(None if rtt is None or math.isnan(rtt) else rtt)
+        data = stats.to_dict()
+        data['grade'] = latency_grade(data['avg'])
+        results.append(data)
+    return results
+
+def batch_stats_numpy(runs):
+    """Version vectorisée : une ligne par run, colonnes masquées au-delà de sa longueur.
+
+    Les percentiles sont exacts (np.partition, même rang que
+    sorted(times)[int(p * n)]) ; les pics suivent la règle en ligne de
+    StreamingStats, moyenne et σ des échantillons précédents calculés par
+    sommes cumulées.
+    """
+    import numpy as np
+    lengths = np.array([len(run) for run in runs], dtype=np.int64)
+    width = int(lengths.max()) if len(runs) else 0
+    x = np.full((len(runs), width), np.nan)
+    for i, run in enumerate(runs):
+        x[i, :lengths[i]] = np.asarray(run, dtype=float)
+    valid = ~np.isnan(x)
+    values = np.where(valid, x, 0.0)
+
+    count = valid.sum(axis=1)
+    n = np.maximum(count, 1)
+    mean = values.sum(axis=1) / n
+    centered = np.where(valid, x - mean[:, None], 0.0)
+    jitter = np.sqrt((centered ** 2).sum(axis=1) / np.maximum(count - 1, 1))
+    jitter[count < 2] = 0
+    low = np.where(valid, x, np.inf).min(axis=1, initial=np.inf)
+    high = np.where(valid, x, -np.inf).max(axis=1, initial=-np.inf)
+
+    # Pics : échantillon > moyenne + max(3σ, plancher) des échantillons valides précédents
+    seen = np.cumsum(valid, axis=1) - valid
+    prev_sum = np.cumsum(values, axis=1) - values
+    prev_sq = np.cumsum(values ** 2, axis=1) - values ** 2
+    prev_n = np.maximum(seen, 2)
+    prev_mean = prev_sum / prev_n
+    prev_var = np.maximum((prev_sq - prev_sum * prev_mean) / (prev_n - 1), 0)
+    spikes = (valid & (seen >= StreamingStats.SPIKE_WARMUP)
+              & (values > prev_mean + np.maximum(3 * np.sqrt(prev_var), StreamingStats.SPIKE_FLOOR))).sum(axis=1)
+
+    # NaN triés en fin de ligne : le rang k porte sur les seuls échantillons valides.
+    # Runs de longueurs très variées = beaucoup de rangs : un tri complet coûte moins.
+    ranks = {p: np.minimum((p * count).astype(np.int64), np.maximum(count - 1, 0)) for p in (0.95, 0.99)}
+    kth = np.unique(np.concatenate(list(ranks.values()))) if width else []
+    if len(kth) > 8:
+        parted = np.sort(x, axis=1)
+    else:
+        parted = np.partition(x, kth, axis=1) if width else x
+    quantiles = {p: np.take_along_axis(parted, k[:, None], axis=1)[:, 0] if width else np.zeros(len(runs))
+                 for p, k in ranks.items()}
+
+    bounds = np.array([limit for limit, _, _ in LATENCY_GRADES[:-1]])
+    grades = np.searchsorted(bounds, mean, side='left')
+    sent = np.maximum(lengths, 1)
+
+    return [{
+        'loss': float((lengths[i] - count[i]) / sent[i] * 100) if lengths[i] else 0,
+        'avg': float(mean[i]),
+        'min': float(low[i]),
+        'max': float(high[i]),
+        'jitter': float(jitter[i]),
+        'p95': float(quantiles[0.95][i]) if count[i] else 0,
+        'p99': float(quantiles[0.99][i]) if count[i] else 0,
+        'spikes': int(spikes[i]),
+        'samples': int(count[i]),
+        'sent': int(lengths[i]),
+        'grade': int(grades[i]),
+    } for i in range(len(runs))]
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+ICMP_TIME_EXCEEDED = 11
+
+def icmp_checksum(data):
+    """Checksum ICMP (RFC 1071)"""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+# Horodatage noyau (Linux) : SO_TIMESTAMPING donne l'instant d'envoi (file
+# d'erreurs, numéroté par OPT_ID) et de réception ; SO_TIMESTAMPNS seulement
+# la réception. Les deux sont sur CLOCK_REALTIME, comme time.time_ns().
+SO_TIMESTAMPNS = getattr(socket, 'SO_TIMESTAMPNS', 35)
+SO_TIMESTAMPING = getattr(socket, 'SO_TIMESTAMPING', 37)
+# TX_SOFTWARE | RX_SOFTWARE | SOFTWARE | OPT_ID | OPT_TSONLY
+SOF_TIMESTAMPING = (1 << 1) | (1 << 3) | (1 << 4) | (1 << 7) | (1 << 11)
+IP_RECVERR = getattr(socket, 'IP_RECVERR', 11)
+SO_EE_ORIGIN_ICMP = 2
+SO_EE_ORIGIN_TIMESTAMPING = 4
+SOCK_EXTENDED_ERR = struct.Struct('=IBBBBII')
+TIMESPEC = struct.Struct('@ll')
+TIMESTAMP_CMSG_SPACE = 128
+
+def enable_timestamps(sock):
+    """Active l'horodatage noyau : 'txrx', 'rx' ou None si l'OS ne le permet pas"""
+    if not sys.platform.startswith('linux') or not hasattr(sock, 'recvmsg'):
+        return None
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPING, SOF_TIMESTAMPING)
+        return 'txrx'
+    except OSError:
+        pass
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+        return 'rx'
+    except OSError:
+        return None
+
+def rx_timestamp_ns(ancdata):
+    """Horodatage noyau (ns) dans les données auxiliaires, None si absent"""
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind in (SO_TIMESTAMPNS, SO_TIMESTAMPING) \
+                and len(data) >= TIMESPEC.size:
+            # SCM_TIMESTAMPING : 3 timespec, le logiciel est le premier
+            sec, nsec = TIMESPEC.unpack(data[:TIMESPEC.size])
+            if sec or nsec:
+                return sec * 1_000_000_000 + nsec
+    return None
+
+def error_queue_batches(sock, mmsg=None):
+    """Lots de la file d'erreurs [(datagramme, destination, ancdata)] jusqu'à épuisement.
+
+    Avec `mmsg` (MmsgSocket), un appel recvmmsg par lot ; un lot incomplet
+    signifie que la file est vide. Chaque lot produit = un appel système.
+    """
+    while True:
+        if mmsg:
+            batch = mmsg.recv_batch(socket.MSG_ERRQUEUE)
+            yield batch
+            if len(batch) < mmsg.batch:
+                return
+            continue
+        try:
+            payload, ancdata, _, addr = sock.recvmsg(2048, TIMESTAMP_CMSG_SPACE,
+                                                     socket.MSG_ERRQUEUE | socket.MSG_DONTWAIT)
+        except OSError:
+            yield []
+            return
+        yield [(payload, addr[0] if addr else None, ancdata)]
+
+def read_error_queue(sock, mmsg=None):
+    """Vide la file d'erreurs de la socket.
+
+    Renvoie (horodatages d'envoi [(id OPT_ID, ns)], erreurs ICMP
+    [(datagramme d'origine, destination, émetteur, type ICMP, ns)],
+    appels système).
+    """
+    stamps, errors, calls = [], [], 0
+    for batch in error_queue_batches(sock, mmsg):
+        calls += 1
+        for payload, dst, ancdata in batch:
+            stamp = rx_timestamp_ns(ancdata)
+            for level, kind, data in ancdata:
+                if level != socket.IPPROTO_IP or kind != IP_RECVERR or len(data) < SOCK_EXTENDED_ERR.size:
+                    continue
+                err = SOCK_EXTENDED_ERR.unpack(data[:SOCK_EXTENDED_ERR.size])
+                if err[1] == SO_EE_ORIGIN_TIMESTAMPING and stamp:
+                    stamps.append((err[6], stamp))
+                elif err[1] == SO_EE_ORIGIN_ICMP and len(data) >= SOCK_EXTENDED_ERR.size + 8:
+                    # SO_EE_OFFENDER : sockaddr_in du routeur qui a répondu
+                    offset = SOCK_EXTENDED_ERR.size + 4
+                    offender = socket.inet_ntoa(data[offset:offset + 4])
+                    errors.append((payload, dst, offender, err[2], stamp))
+    return stamps, errors, calls
+
+def kernel_rtt(rx_ns, send_ns):
+    """RTT en secondes entre l'envoi et la réception noyau, None si incohérent"""
+    if rx_ns is None or send_ns is None or rx_ns < send_ns:
+        return None
+    return (rx_ns - send_ns) / 1e9
+
+class KernelTimestamps:
+    """Suivi des horodatages d'envoi noyau d'un transport (compteur OPT_ID -> jeton)"""
+
+    def __init__(self, sock, enabled=True):
+        self.sock = sock
+        self.mode = enable_timestamps(sock) if enabled else None
+        self.counter = 0
+        self.tokens = {}
+        # Lecture par lots de la file d'erreurs (MmsgSocket), appels système
+        self.mmsg = None
+        self.syscalls = 0
+
+    def sent(self, token):
+        """À appeler après chaque datagramme effectivement envoyé"""
+        if self.mode == 'txrx':
+            if len(self.tokens) > 4096:
+                # Horodatage jamais reçu : on oublie le plus ancien
+                self.tokens.pop(next(iter(self.tokens)))
+            self.tokens[self.counter] = token
+            self.counter = (self.counter + 1) & 0xFFFFFFFF
+
+    def drain(self, pending, field, errors=False):
+        """Remplace l'instant d'envoi (indice `field`) par celui du noyau.
+
+        Avec `errors`, la file est lue même sans horodatage d'envoi et les
+        erreurs ICMP qu'elle contient sont renvoyées (voir read_error_queue).
+        """
+        if self.mode != 'txrx' and not errors:
+            return []
+        stamps, icmp_errors, calls = read_error_queue(self.sock, self.mmsg)
+        self.syscalls += calls
+        for ident, stamp in stamps:
+            token = self.tokens.pop(ident, None)
+            entry = pending.get(token)
+            if entry:
+                pending[token] = entry[:field] + (stamp, True) + entry[field + 2:]
+        return icmp_errors
+
+    def clock(self, tx_kernel):
+        return 'kernel' if tx_kernel else 'kernel-rx'
+
+class ProbeTransport:
+    """Interface commune des transports de probes.
+
+    Un transport implémente `send(ip)`, qui émet une probe sans attendre et
+    renvoie (jeton, future, instant d'envoi perf_counter). La future reçoit
+    l'instant de réception (None = perdu). Le reste est partagé.
+
+    Chaque RTT est attribué à une horloge : `clock` par défaut, ou celle
+    notée dans `clocks[jeton]` (ex. 'kernel' pour un horodatage noyau).
+    `last_clock` est celle du dernier RTT rendu par wait_reply.
+
+    Les transports `hop_probes` acceptent aussi `send(ip, ttl)` : la réponse
+    peut alors venir d'un routeur intermédiaire, noté dans
+    `responders[jeton]` et rendu dans `last_responder`.
+    """
+
+    name = None
+    clock = 'user'
+    hop_probes = False
+
+    def __init__(self):
+        self.loop = None
+        self.pending = {}
+        self.clocks = {}
+        self.last_clock = None
+        self.responders = {}
+        self.last_responder = None
+
+    def open(self):
+        self.loop = asyncio.get_running_loop()
+        return self
+
+    def close(self):
+        for entry in self.pending.values():
+            if not entry[0].done():
+                entry[0].cancel()
+        self.pending.clear()
+        self.clocks.clear()
+        self.responders.clear()
+
+    async def __aenter__(self):
+        return self.open()
+
+    async def __aexit__(self, *exc):
+        self.close()
+
+    def send(self, ip, ttl=None):
+        raise NotImplementedError
+
+    def poll(self):
+        """Lit les réponses déjà arrivées (boucle en retard sous forte charge)"""
+
+    async def wait_reply(self, token, fut, send_time, timeout=2):
+        """Attend la réponse d'une probe envoyée, renvoie le RTT en ms (None si perdu)"""
+        try:
+            recv_time = await asyncio.wait_for(asyncio.shield(fut), timeout)
+        except asyncio.TimeoutError:
+            # La réponse peut attendre dans la socket alors que le timer a expiré :
+            # avec un horodatage noyau, son RTT réel reste exploitable
+            self.poll()
+            recv_time = fut.result() if fut.done() and not fut.cancelled() else None
+            if recv_time is not None and recv_time - send_time > timeout:
+                recv_time = None
+        finally:
+            entry = self.pending.pop(token, None)
+            source = self.clocks.pop(token, self.clock)
+            responder = self.responders.pop(token, entry[1] if entry else None)
+        if recv_time is None:
+            self.last_clock = self.last_responder = None
+            return None
+        self.last_clock = source
+        self.last_responder = responder
+        return (recv_time - send_time) * 1000
+
+    async def probe(self, ip, timeout=2, ttl=None):
+        """Envoie une probe, renvoie le RTT en ms (None si perdu)"""
+        return await self.wait_reply(*(self.send(ip, ttl) if ttl else self.send(ip)), timeout)
+
+class IcmpEngine(ProbeTransport):
+    """Transport ICMP asyncio : une seule socket pour toutes les cibles.
+
+    `kernel_clock=False` ignore l'horodatage noyau (RTT en espace
+    utilisateur, pour comparer les deux horloges).
+    """
+
+    name = 'icmp'
+    hop_probes = True
+
+    def __init__(self, kernel_clock=True):
+        super().__init__()
+        self.kernel_clock = kernel_clock
+        self.sock = None
+        self.ident = os.getpid() & 0xFFFF
+        self.seq = 0
+        self.ttl = self.default_ttl = None
+        self.hop_errors = False
+
+    def open(self):
+        """Ouvre la socket ICMP (DGRAM sans privilèges, sinon RAW)"""
+        super().open()
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            if sys.platform.startswith('linux'):
+                # Linux impose l'identifiant = port local de la socket
+                sock.bind(('', 0))
+                self.ident = sock.getsockname()[1]
+        except OSError:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        sock.setblocking(False)
+        self.sock = sock
+        self.ttl = self.default_ttl = sock.getsockopt(socket.IPPROTO_IP, socket.IP_TTL)
+        self.timestamps = KernelTimestamps(sock, self.kernel_clock)
+        self.loop.add_reader(sock.fileno(), self._on_readable)
+        return self
+
+    def close(self):
+        if self.sock:
+            self.loop.remove_reader(self.sock.fileno())
+            self.sock.close()
+            self.sock = None
+        super().close()
+
+    def _next_seq(self):
+        # Saute les séquences encore en vol après un tour complet
+        while True:
+            self.seq = (self.seq + 1) & 0xFFFF
+            if self.seq not in self.pending:
+                return self.seq
+
+    def poll(self):
+        if self.sock:
+            self._on_readable()
+
+    def _resolve(self, seq, dst, recv_time, rx_ns, responder=None):
+        entry = self.pending.get(seq)
+        if not entry or entry[1] != dst or entry[0].done():
+            return
+        if responder:
+            self.responders[seq] = responder
+        rtt = kernel_rtt(rx_ns, entry[3])
+        if rtt is not None:
+            self.clocks[seq] = self.timestamps.clock(entry[4])
+            entry[0].set_result(entry[2] + rtt)
+        else:
+            entry[0].set_result(recv_time)
+
+    def _on_readable(self):
+        # Instants d'envoi noyau d'abord : ils précèdent les réponses.
+        # Socket DGRAM Linux : les « TTL dépassé » arrivent par la file d'erreurs.
+        for payload, dst, offender, icmp_type, rx_ns in self.timestamps.drain(self.pending, 3, self.hop_errors):
+            if icmp_type == ICMP_TIME_EXCEEDED and len(payload) >= 8:
+                _, _, _, _, seq = struct.unpack("!BBHHH", payload[:8])
+                self._resolve(seq, dst, time.perf_counter(), rx_ns, offender)
+        while True:
+            try:
+                if self.timestamps.mode:
+                    data, ancdata, _, addr = self.sock.recvmsg(2048, TIMESTAMP_CMSG_SPACE)
+                else:
+                    data, addr = self.sock.recvfrom(2048)
+                    ancdata = ()
+            except BlockingIOError:
+                return
+            except OSError:
+                # IP_RECVERR : l'erreur ICMP en attente est rendue une fois, puis effacée
+                if self.hop_errors:
+                    continue
+                return
+            recv_time = time.perf_counter()
+            # Socket RAW (ou DGRAM hors Linux) : en-tête IPv4 à retirer
+            if data and data[0] >> 4 == 4:
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < 8:
+                continue
+            icmp_type, _, _, ident, seq = struct.unpack("!BBHHH", data[:8])
+            if icmp_type == ICMP_TIME_EXCEEDED and len(data) >= 36:
+                # Routeur intermédiaire : en-tête IP + 8 octets de notre echo request
+                inner = data[8:]
+                start = (inner[0] & 0x0F) * 4
+                if len(inner) < start + 8:
+                    continue
+                inner_type, _, _, ident, seq = struct.unpack("!BBHHH", inner[start:start + 8])
+                if inner_type == ICMP_ECHO_REQUEST and ident == self.ident:
+                    self._resolve(seq, socket.inet_ntoa(inner[16:20]), recv_time,
+                                  rx_timestamp_ns(ancdata), addr[0])
+                continue
+            if icmp_type != ICMP_ECHO_REPLY or ident != self.ident:
+                continue
+            self._resolve(seq, addr[0], recv_time, rx_timestamp_ns(ancdata))
+
+    def set_ttl(self, ttl):
+        """TTL des prochains envois (None = valeur système)"""
+        ttl = ttl or self.default_ttl
+        if ttl == self.ttl:
+            return
+        if not self.hop_errors and self.sock.type == socket.SOCK_DGRAM and sys.platform.startswith('linux'):
+            self.sock.setsockopt(socket.IPPROTO_IP, IP_RECVERR, 1)
+            self.hop_errors = True
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+        self.ttl = ttl
+
+    def send(self, ip, ttl=None):
+        """Envoie un echo request sans attendre, renvoie (seq, future, instant d'envoi)"""
+        self.set_ttl(ttl)
+        seq = self._next_seq()
+        payload = struct.pack("!d", time.time()) + b'cs2-lagtest'
+        header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, self.ident, seq)
+        checksum = icmp_checksum(header + payload)
+        packet = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, self.ident, seq) + payload
+
+        fut = self.loop.create_future()
+        send_time = time.perf_counter()
+        # (future, ip, instant perf_counter, envoi en time_ns, envoi horodaté par le noyau)
+        self.pending[seq] = (fut, ip, send_time, time.time_ns(), False)
+        try:
+            try:
+                self.sock.sendto(packet, (ip, 0))
+            except OSError:
+                if not self.hop_errors:
+                    raise
+                # Erreur d'une probe précédente (TTL dépassé) rendue par cet envoi
+                self.sock.sendto(packet, (ip, 0))
+        except OSError:
+            fut.set_result(None)  # Envoi impossible : compté comme perdu
+        else:
+            self.timestamps.sent(seq)
+        return seq, fut, send_time
+
+async def ping_target(engine, ip, count, interval=0.1, timeout=2, budget=None, offset=0,
+                      on_reply=None):
+    """Envoie `count` probes espacées de `interval` sans attendre les réponses.
+
+    `on_reply(rtt)` est appelé à l'arrivée de chaque réponse (ou perte).
+    """
+    async def probe():
+        if budget is None:
+            rtt = await engine.probe(ip, timeout)
+        else:
+            async with budget:
+                rtt = await engine.probe(ip, timeout)
+        emit('sample', ip=ip, rtt=rtt)
+        if on_reply:
+            on_reply(rtt)
+        return rtt
+
+    if offset:
+        await asyncio.sleep(offset)
+    tasks = []
+    for i in range(count):
+        if i:
+            await asyncio.sleep(interval)
+        tasks.append(asyncio.ensure_future(probe()))
+    return await asyncio.gather(*tasks)
+
+# Le timer asyncio déborde d'~1ms : on finit l'attente en rendant la main
+SPIN_MARGIN = 0.0015
+
+async def paced_probes(engine, ip, count, rate=128, timeout=2, on_reply=None, keep=True,
+                       on_sample=None, bucket=None):
+    """Probes à cadence fixe (horloge monotone), plusieurs en vol à la fois.
+
+    Renvoie (rtts, cadence) où cadence mesure l'écart entre les instants
+    d'envoi réels et la grille théorique à `rate` Hz. `on_reply(rtt)` est
+    appelé à l'arrivée de chaque réponse (ou perte), `on_sample(t, rtt)`
+    aussi avec l'instant d'envoi relatif au départ. Avec `count=None` et
+    `keep=False`, la boucle tourne sans fin en mémoire constante. Un
+    `bucket` (TokenBucket partagé) plafonne le débit global ; une attente
+    de jeton apparaît dans la dérive.
+    """
+    async def wait(seq, fut, send_time):
+        rtt = await engine.wait_reply(seq, fut, send_time, timeout)
+        if PROFILE and rtt is not None:
+            PROFILE.record_wake(send_time, rtt, engine.last_clock)
+        if engine.last_clock:
+            clocks[engine.last_clock] = clocks.get(engine.last_clock, 0) + 1
+        if on_reply:
+            on_reply(rtt)
+        if on_sample:
+            on_sample(send_time - start, rtt)
+        return rtt
+
+    period = 1 / rate
+    waits = []
+    in_flight = set()
+    drift_sum = 0.0
+    drift_max = 0.0
+    sent = 0
+    # Horloges des RTT de cette série seulement (transport partagé entre cibles)
+    clocks = {}
+    start = time.perf_counter()
+    while count is None or sent < count:
+        deadline = start + sent * period
+        # Sommeil grossier puis rendu de main à la boucle jusqu'à l'échéance
+        delay = deadline - time.perf_counter() - SPIN_MARGIN
+        if delay > 0:
+            await asyncio.sleep(delay)
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(0)
+        if PROFILE:
+            PROFILE.record_sched(deadline)
+        if bucket:
+            await bucket.acquire()
+        before = time.perf_counter()
+        seq, fut, send_time = engine.send(ip)
+        if PROFILE:
+            PROFILE.record_send(before)
+        drift = (send_time - deadline) * 1000
+        drift_sum += drift
+        drift_max = max(drift_max, drift)
+        sent += 1
+        task = asyncio.ensure_future(wait(seq, fut, send_time))
+        if keep:
+            waits.append(task)
+        else:
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+    elapsed = time.perf_counter() - start
+    rtts = await asyncio.gather(*waits, *in_flight)
+
+    cadence = {
+        'rate': rate,
+        'achieved_rate': (sent - 1) / elapsed if sent > 1 and elapsed > 0 else rate,
+        'drift_avg': drift_sum / sent if sent else 0,
+        'drift_max': drift_max,
+        'send_duration': elapsed,
+        'clocks': clocks,
+    }
+    return rtts[:len(waits)], cadence
+
+async def paced_test(ip, count, rate=128, timeout=2, on_reply=None, on_sample=None, engine=None,
+                     bucket=None, keep=True):
+    async with transport_scope(engine) as engine:
+        return await paced_probes(engine, ip, count, rate, timeout, on_reply, keep,
+                                  on_sample=on_sample, bucket=bucket)
+
+class TokenBucket:
+    """Seau à jetons partagé : au plus `rate` paquets/s, rafales de `burst` (50 ms par défaut)"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, rate / 20)
+        self.tokens = self.burst
+        self.stamp = time.perf_counter()
+        self.waits = 0
+
+    async def acquire(self):
+        while True:
+            now = time.perf_counter()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            self.waits += 1
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+# Probes simultanément en vol pendant un scan (tous relais confondus)
+MAX_IN_FLIGHT = 256
+
+async def scan_targets(ips, count=10, interval=0.1, timeout=2, on_result=None,
+                       max_in_flight=MAX_IN_FLIGHT, engine=None, counts=None):
+    """Scanne toutes les cibles en parallèle sur une seule socket.
+
+    Les départs sont étalés sur un intervalle pour lisser le débit, et
+    `max_in_flight` borne le nombre de probes en attente de réponse :
+    ajouter des relais ne rallonge pas le scan tant que le budget suffit.
+    `counts` donne un nombre de probes propre à certaines cibles.
+    """
+    results = {}
+    targets = list(dict.fromkeys(ips))
+    budget = asyncio.Semaphore(max_in_flight)
+    async with transport_scope(engine) as engine:
+        async def run(i, ip):
+            rtts = await ping_target(engine, ip, counts.get(ip, count) if counts else count,
+                                     interval, timeout, budget, offset=interval * i / len(targets))
+            results[ip] = rtts
+            if on_result:
+                on_result(ip, rtts)
+        await asyncio.gather(*(run(i, ip) for i, ip in enumerate(targets)))
+    return results
+
+class PythonPingTransport(ProbeTransport):
+    """Transport historique : un pythonping.ping bloquant par probe, dans un thread"""
+
+    name = 'pythonping'
+
+    def __init__(self, timeout=2):
+        super().__init__()
+        from pythonping import ping  # Dépendance optionnelle
+        self.ping = ping
+        self.timeout = timeout
+
+    def send(self, ip):
+        send_time = time.perf_counter()
+
+        def blocking_probe():
+            try:
+                resp = next(iter(self.ping(ip, count=1, timeout=self.timeout)))
+            except Exception:
+                return None
+            return send_time + resp.time_elapsed if resp.success else None
+
+        fut = self.loop.run_in_executor(None, blocking_probe)
+        token = object()
+        self.pending[token] = (fut, ip, send_time)
+        return token, fut, send_time
+
+# Profil simulé par défaut : latence de base ms, jitter ms, perte, entrée et
+# sortie de rafale de pertes (Gilbert-Elliott), perte en rafale, réordonnancement
+SIM_DEFAULTS = {
+    'base': 20.0,
+    'jitter': 1.0,
+    'loss': 0.0,
+    'burst_enter': 0.0,
+    'burst_exit': 0.3,
+    'burst_loss': 0.8,
+    'reorder': 0.0,
+}
+
+class SimulatedTransport(ProbeTransport):
+    """Réseau simulé en processus, déterministe à graine fixe.
+
+    `profiles` associe une IP à un dict de paramètres (voir SIM_DEFAULTS).
+    Les RTT suivent base + jitter × lognormale ; les pertes alternent
+    entre état normal et rafale ; une probe réordonnée est retardée d'une
+    période de jitter supplémentaire. Une IP sans profil reçoit un profil
+    stable dérivé de son adresse (5 à 80 ms), `None` la rend muette.
+
+    Le chemin vers une cible est la liste `path` de son profil (IP des
+    routeurs, chacun avec son propre profil de bout en bout), sinon 3 à 7
+    sauts dont la latence croît jusqu'à celle de la cible. Une probe à TTL t < nombre
+    de sauts + 1 est « répondue » par le t-ième routeur.
+
+    Chaque IP tire dans son propre générateur (graine, IP) : la suite des
+    RTT d'une cible ne dépend pas de l'entrelacement des envois.
+    """
+
+    name = 'sim'
+    clock = 'sim'
+    hop_probes = True
+
+    def __init__(self, profiles=None, seed=0):
+        super().__init__()
+        self.profiles = profiles or {}
+        self.seed = seed
+        self.rngs = {}
+        self.in_burst = {}
+        self.sent = 0
+
+    def profile(self, ip):
+        if ip not in self.profiles:
+            import zlib
+            digest = zlib.crc32(ip.encode()) % 1000 / 1000
+            self.profiles[ip] = {'base': 5 + 75 * digest, 'jitter': 0.5 + 3 * digest}
+        profile = self.profiles[ip]
+        return None if profile is None else dict(SIM_DEFAULTS, **profile)
+
+    def path(self, ip):
+        """IP des routeurs entre le client et `ip`"""
+        profile = self.profile(ip) or dict(SIM_DEFAULTS)
+        if 'path' not in profile:
+            import zlib
+            digest = zlib.crc32(ip.encode())
+            hops = 3 + digest % 5
+            path = []
+            for k in range(1, hops + 1):
+                hop = f"10.{k}.{digest >> 8 & 0xFF}.{digest & 0xFF}"
+                share = (k / (hops + 1)) ** 2
+                self.profiles.setdefault(hop, {'base': profile['base'] * share,
+                                               'jitter': profile['jitter'] * share})
+                path.append(hop)
+            if self.profiles.get(ip) is not None:
+                self.profiles[ip]['path'] = path
+            return path
+        return profile['path']
+
+    def draw(self, ip):
+        """RTT simulé en ms pour la prochaine probe vers `ip` (None = perdu)"""
+        self.sent += 1
+        profile = self.profile(ip)
+        if profile is None:
+            return None
+        rng = self.rngs.get(ip)
+        if rng is None:
+            import random
+            rng = self.rngs[ip] = random.Random(f"{self.seed}:{ip}")
+        burst = self.in_burst.get(ip, False)
+        burst = rng.random() >= profile['burst_exit'] if burst else rng.random() < profile['burst_enter']
+        self.in_burst[ip] = burst
+        if rng.random() < (profile['burst_loss'] if burst else profile['loss']):
+            return None
+        rtt = profile['base'] + profile['jitter'] * rng.lognormvariate(0, 0.5)
+        if rng.random() < profile['reorder']:
+            rtt += 2 * profile['jitter'] + 1
+        return rtt
+
+    def send(self, ip, ttl=None):
+        responder = ip
+        if ttl:
+            path = self.path(ip)
+            responder = path[ttl - 1] if ttl <= len(path) else ip
+        rtt = self.draw(responder)
+        fut = self.loop.create_future()
+        send_time = time.perf_counter()
+        token = object()
+        self.pending[token] = (fut, ip, send_time)
+        if ttl:
+            self.responders[token] = responder
+        if rtt is not None:
+            # RTT exact (déterministe) même si la boucle réveille en retard
+            self.loop.call_later(rtt / 1000, lambda: fut.done() or fut.set_result(send_time + rtt / 1000))
+        return token, fut, send_time
+
+# Probes UDP : datagramme horodaté renvoyé tel quel par le relais (ou un écho)
+UDP_MAGIC = b'CS2L'
+UDP_PACKET = struct.Struct('!4sId')
+UDP_DEFAULT_PORT = 27015
+UDP_BATCH = 64
+# Réponses horodatées par le noyau : lues au plus toutes les 50ms, le RTT
+# ne dépend pas de l'instant de lecture
+UDP_RX_LINGER = 0.05
+# Port UDP de chaque relais, d'après le port_range de la config SDR
+RELAY_PORTS = {}
+
+def load_mmsg():
+    """sendmmsg/recvmmsg de la libc via ctypes (Linux), None si indisponibles"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.sendmmsg, libc.recvmmsg
+    except (OSError, AttributeError):
+        return None
+
+    class iovec(ctypes.Structure):
+        _fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+
+    class msghdr(ctypes.Structure):
+        _fields_ = [('msg_name', ctypes.c_void_p), ('msg_namelen', ctypes.c_uint32),
+                    ('msg_iov', ctypes.POINTER(iovec)), ('msg_iovlen', ctypes.c_size_t),
+                    ('msg_control', ctypes.c_void_p), ('msg_controllen', ctypes.c_size_t),
+                    ('msg_flags', ctypes.c_int)]
+
+    class mmsghdr(ctypes.Structure):
+        _fields_ = [('msg_hdr', msghdr), ('msg_len', ctypes.c_uint)]
+
+    return ctypes, libc, iovec, mmsghdr
+
+class MmsgSocket:
+    """Envoi/réception par lots : un appel système pour jusqu'à `batch` datagrammes"""
+
+    MSG_DONTWAIT = 0x40
+    SOCKADDR_IN = 16
+    CONTROL = TIMESTAMP_CMSG_SPACE
+    CMSGHDR = struct.Struct('@Nii')
+
+    def __init__(self, sock, mmsg, batch=UDP_BATCH, size=2048):
+        ctypes, self.libc, iovec, mmsghdr = mmsg
+        self.ctypes = ctypes
+        self.iovec, self.mmsghdr = iovec, mmsghdr
+        self.fd = sock.fileno()
+        self.batch = batch
+        self.bufs = [ctypes.create_string_buffer(size) for _ in range(batch)]
+        self.names = [ctypes.create_string_buffer(self.SOCKADDR_IN) for _ in range(batch)]
+        self.controls = [ctypes.create_string_buffer(self.CONTROL) for _ in range(batch)]
+        self.iovs = (iovec * batch)()
+        self.msgs = (mmsghdr * batch)()
+        for i in range(batch):
+            self.iovs[i].iov_base = ctypes.cast(self.bufs[i], ctypes.c_void_p)
+            self.iovs[i].iov_len = size
+            self.msgs[i].msg_hdr.msg_name = ctypes.cast(self.names[i], ctypes.c_void_p)
+            self.msgs[i].msg_hdr.msg_iov = ctypes.pointer(self.iovs[i])
+            self.msgs[i].msg_hdr.msg_iovlen = 1
+            self.msgs[i].msg_hdr.msg_control = ctypes.cast(self.controls[i], ctypes.c_void_p)
+
+    def ancdata(self, i):
+        """Données auxiliaires du message i, au format de socket.recvmsg"""
+        raw = self.controls[i].raw[:self.msgs[i].msg_hdr.msg_controllen]
+        align = struct.calcsize('N')
+        items = []
+        offset = 0
+        while offset + self.CMSGHDR.size <= len(raw):
+            length, level, kind = self.CMSGHDR.unpack_from(raw, offset)
+            if length < self.CMSGHDR.size:
+                break
+            items.append((level, kind, raw[offset + self.CMSGHDR.size:offset + length]))
+            offset += (length + align - 1) // align * align
+        return items
+
+    def recv_batch(self, flags=0):
+        """Datagrammes en attente [(données, ip, ancdata)], liste vide si rien à lire.
+
+        `flags` s'ajoute à MSG_DONTWAIT (ex. MSG_ERRQUEUE).
+        """
+        for i in range(self.batch):
+            self.msgs[i].msg_hdr.msg_namelen = self.SOCKADDR_IN
+            self.msgs[i].msg_hdr.msg_controllen = self.CONTROL
+        n = self.libc.recvmmsg(self.fd, self.msgs, self.batch, self.MSG_DONTWAIT | flags, None)
+        if n < 0:
+            return []
+        return [(self.bufs[i].raw[:self.msgs[i].msg_len], socket.inet_ntoa(self.names[i].raw[4:8]),
+                 self.ancdata(i))
+                for i in range(n)]
+
+    def send_batch(self, packets):
+        """Envoie [(données, ip, port)] ; renvoie le nombre de datagrammes partis"""
+        ctypes = self.ctypes
+        count = len(packets)
+        keep = []
+        iovs = (self.iovec * count)()
+        msgs = (self.mmsghdr * count)()
+        for i, (data, ip, port) in enumerate(packets):
+            buf = ctypes.create_string_buffer(data, len(data))
+            name = ctypes.create_string_buffer(
+                struct.pack('=H', socket.AF_INET) + struct.pack('!H', port) + socket.inet_aton(ip) + bytes(8),
+                self.SOCKADDR_IN)
+            keep += [buf, name]
+            iovs[i].iov_base = ctypes.cast(buf, ctypes.c_void_p)
+            iovs[i].iov_len = len(data)
+            msgs[i].msg_hdr.msg_name = ctypes.cast(name, ctypes.c_void_p)
+            msgs[i].msg_hdr.msg_namelen = self.SOCKADDR_IN
+            msgs[i].msg_hdr.msg_iov = ctypes.pointer(iovs[i])
+            msgs[i].msg_hdr.msg_iovlen = 1
+        return max(self.libc.sendmmsg(self.fd, msgs, count, 0), 0)
+
+class UdpTransport(ProbeTransport):
+    """Probes UDP sans privilèges vers le port des relais, envoi/réception par lots.
+
+    Les envois d'une même itération de la boucle partent ensemble au tour
+    suivant (sendmmsg si disponible) ; le délai de mise en file est retiré
+    du RTT. Les réponses sont lues par lots (recvmmsg). Quand le noyau les
+    horodate, elles ne sont lues que toutes les UDP_RX_LINGER secondes tant
+    que des probes sont en vol, au lieu d'un réveil par datagramme ; sinon
+    dès qu'elles arrivent. `syscalls` compte les appels d'envoi et de lecture.
+    """
+
+    name = 'udp'
+
+    def __init__(self, port=None):
+        super().__init__()
+        self.sock = None
+        self.mmsg = None
+        self.port = port
+        self.seq = 0
+        self.queue = []
+        self.io_calls = 0
+        self.reader = None
+
+    @property
+    def syscalls(self):
+        return self.io_calls + self.timestamps.syscalls
+
+    def open(self):
+        super().open()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.bind(('', 0))
+        self.sock = sock
+        self.timestamps = KernelTimestamps(sock)
+        mmsg = load_mmsg()
+        if mmsg:
+            self.mmsg = self.timestamps.mmsg = MmsgSocket(sock, mmsg)
+        if not self.timestamps.mode:
+            self.loop.add_reader(sock.fileno(), self._on_readable)
+        return self
+
+    def close(self):
+        if self.reader:
+            self.reader.cancel()
+            self.reader = None
+        if self.sock:
+            if not self.timestamps.mode:
+                self.loop.remove_reader(self.sock.fileno())
+            self.sock.close()
+            self.sock = None
+        super().close()
+
+    def port_for(self, ip):
+        return self.port or RELAY_PORTS.get(ip, UDP_DEFAULT_PORT)
+
+    def send(self, ip):
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        seq = self.seq
+        fut = self.loop.create_future()
+        send_time = time.perf_counter()
+        # (future, ip, instant de send(), délai avant départ du lot, départ en
+        # time_ns, départ horodaté par le noyau)
+        self.pending[seq] = (fut, ip, send_time, 0.0, None, False)
+        if not self.queue:
+            self.loop.call_soon(self._flush)
+        self.queue.append((seq, ip, send_time))
+        if self.timestamps.mode and not self.reader:
+            self.reader = self.loop.call_later(UDP_RX_LINGER, self._linger)
+        return seq, fut, send_time
+
+    def _flush(self):
+        queue, self.queue = self.queue, []
+        if not self.sock:
+            return
+        packets = [(UDP_PACKET.pack(UDP_MAGIC, seq, time.time()), ip, self.port_for(ip))
+                   for seq, ip, _ in queue]
+        flush_time = time.perf_counter()
+        flush_ns = time.time_ns()
+        sent = 0
+        while self.mmsg and sent < len(packets):
+            batch = self.mmsg.send_batch(packets[sent:sent + UDP_BATCH])
+            self.io_calls += 1
+            if not batch:
+                break
+            sent += batch
+        for data, ip, port in packets[sent:]:
+            self.io_calls += 1
+            try:
+                self.sock.sendto(data, (ip, port))
+            except OSError:
+                pass
+            else:
+                sent += 1
+        for i, (seq, ip, send_time) in enumerate(queue):
+            entry = self.pending.get(seq)
+            if not entry:
+                continue
+            if i < sent:
+                self.pending[seq] = (entry[0], ip, send_time, flush_time - send_time, flush_ns, False)
+                self.timestamps.sent(seq)
+            elif not entry[0].done():
+                entry[0].set_result(None)  # Envoi impossible : compté comme perdu
+
+    def _read_batch(self):
+        """Jusqu'à UDP_BATCH datagrammes ; un lot incomplet vide la socket"""
+        if self.mmsg:
+            self.io_calls += 1
+            return self.mmsg.recv_batch()
+        batch = []
+        while len(batch) < UDP_BATCH:
+            self.io_calls += 1
+            try:
+                if self.timestamps.mode:
+                    data, ancdata, _, addr = self.sock.recvmsg(2048, TIMESTAMP_CMSG_SPACE)
+                else:
+                    data, addr = self.sock.recvfrom(2048)
+                    ancdata = ()
+            except OSError:
+                break
+            batch.append((data, addr[0], ancdata))
+        return batch
+
+    def poll(self):
+        if self.sock:
+            self._on_readable()
+
+    def _linger(self):
+        """Lecture différée ; relancée tant qu'une probe attend sa réponse"""
+        self.reader = None
+        if not self.sock:
+            return
+        self._on_readable()
+        if any(not entry[0].done() for entry in self.pending.values()):
+            self.reader = self.loop.call_later(UDP_RX_LINGER, self._linger)
+
+    def _on_readable(self):
+        self.timestamps.drain(self.pending, 4)
+        while True:
+            batch = self._read_batch()
+            recv_time = time.perf_counter()
+            for data, ip, ancdata in batch:
+                if len(data) < UDP_PACKET.size or data[:4] != UDP_MAGIC:
+                    continue
+                _, seq, _ = UDP_PACKET.unpack(data[:UDP_PACKET.size])
+                entry = self.pending.get(seq)
+                if not entry or entry[1] != ip or entry[0].done():
+                    continue
+                rtt = kernel_rtt(rx_timestamp_ns(ancdata), entry[4])
+                if rtt is not None:
+                    # Horodatage noyau : insensible à la taille du lot et au GIL
+                    self.clocks[seq] = self.timestamps.clock(entry[5])
+                    entry[0].set_result(entry[2] + rtt)
+                else:
+                    entry[0].set_result(recv_time - entry[3])
+            if len(batch) < UDP_BATCH:
+                return
+
+class UdpEchoProtocol(asyncio.DatagramProtocol):
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.transport.sendto(data, addr)
+
+async def open_udp_echo(port, host='0.0.0.0'):
+    """Ouvre l'écho UDP, renvoie (transport asyncio, port effectif)"""
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(UdpEchoProtocol, local_addr=(host, port))
+    return transport, transport.get_extra_info('sockname')[1]
+
+async def udp_echo_server(port, host='0.0.0.0'):
+    """Écho UDP local pour tester --transport udp sans relais"""
+    transport, _ = await open_udp_echo(port, host)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        transport.close()
+
+TRANSPORTS = {
+    'icmp': IcmpEngine,
+    'pythonping': PythonPingTransport,
+    'sim': SimulatedTransport,
+    'udp': UdpTransport,
+}
+
+# Transport utilisé quand aucun n'est fourni (--transport)
+DEFAULT_TRANSPORT = 'icmp'
+
+def new_transport(name=None):
+    return TRANSPORTS[name or DEFAULT_TRANSPORT]()
+
+@asynccontextmanager
+async def transport_scope(engine=None):
+    """Transport fourni (déjà ouvert par l'appelant) ou transport par défaut"""
+    if engine is not None:
+        yield engine
+    else:
+        async with new_transport() as engine:
+            yield engine
+
+# Course adaptative : z ≈ 95%, plancher d'incertitude = résolution de mesure
+RACE_Z = 2.0
+RACE_MIN_SE = 0.1
+
+def race_estimate(relay_stats):
+    """(score, erreur type) d'un POP : médiane des relais ayant répondu"""
+    answered = [st for st in relay_stats.values() if st.count]
+    if not answered:
+        return None, None
+    score = statistics.median(st.mean for st in answered)
+    se = max(st.stdev / math.sqrt(st.count) for st in answered)
+    return score, max(se, RACE_MIN_SE)
+
+async def race_scan(candidates, top_k=3, min_rounds=3, max_rounds=10, interval=0.1,
+                    timeout=2, engine=None):
+    """Scan adaptatif (racing) : élimine tôt les POPs clairement battus.
+
+    `candidates` associe un identifiant à sa liste de relais. À chaque tour,
+    chaque relais des candidats encore en course reçoit une probe. Dès que
+    `min_rounds` tours sont terminés, un candidat dont la borne basse dépasse la borne haute
+    du k-ième meilleur est éliminé ; le budget restant va aux candidats
+    serrés. Renvoie ({id: {relais: StreamingStats}}, {id: tour de sortie}, paquets).
+    """
+    rtts = {}   # (id, relais, tour) -> RTT
+    active = set(candidates)
+    exits = {}
+    sent = 0
+
+    def snapshot(upto):
+        """Stats de chaque relais sur les tours 1..upto, rejoués dans l'ordre"""
+        stats = {cid: {ip: StreamingStats() for ip in relays} for cid, relays in candidates.items()}
+        for round_no in range(1, upto + 1):
+            for cid, relays in candidates.items():
+                for ip in relays:
+                    if (cid, ip, round_no) in rtts:
+                        stats[cid][ip].add(rtts[cid, ip, round_no])
+        return stats
+
+    async def probe_into(engine, cid, ip, round_no, delay):
+        await asyncio.sleep(delay)
+        rtts[cid, ip, round_no] = await engine.probe(ip, timeout)
+
+    async def run(engine):
+        nonlocal sent
+        # Les tours s'enchaînent sans attendre les retardataires, mais les
+        # décisions ne portent que sur les tours terminés : elles ne
+        # dépendent pas de l'ordre d'arrivée des réponses
+        rounds = []
+        for round_no in range(1, max_rounds + 1):
+            if round_no > 1:
+                await asyncio.sleep(interval)
+            # Ordre des candidats (pas celui du set) : envois reproductibles
+            probes = [(cid, ip) for cid in candidates if cid in active for ip in candidates[cid]]
+            rounds.append([asyncio.ensure_future(probe_into(engine, cid, ip, round_no, i * interval / len(probes)))
+                           for i, (cid, ip) in enumerate(probes)])
+            sent += len(probes)
+            done = round_no - 1
+            if done < min_rounds:
+                continue
+            await asyncio.gather(*rounds[done - 1])
+            stats = snapshot(done)
+
+            bounds = {}
+            for cid in [cid for cid in candidates if cid in active]:
+                score, se = race_estimate(stats[cid])
+                if score is not None:
+                    bounds[cid] = (score - RACE_Z * se, score, score + RACE_Z * se)
+                elif all(st.sent >= min_rounds for st in stats[cid].values()):
+                    # Aucune réponse après plusieurs tours complets
+                    active.discard(cid)
+                    exits[cid] = round_no
+            ranked = sorted(bounds, key=lambda cid: bounds[cid][1])
+            if len(ranked) > top_k:
+                threshold = bounds[ranked[top_k - 1]][2]
+                for cid in ranked[top_k:]:
+                    if bounds[cid][0] > threshold:
+                        active.discard(cid)
+                        exits[cid] = round_no
+                ranked = [cid for cid in ranked if cid in active]
+            # Classement du top-k tranché : inutile de continuer
+            if len(active) <= top_k and len(ranked) == len(active) and all(
+                    bounds[a][2] < bounds[b][0] for a, b in zip(ranked, ranked[1:])):
+                break
+        await asyncio.gather(*(task for tasks in rounds for task in tasks))
+
+    async with transport_scope(engine) as engine:
+        await run(engine)
+    return snapshot(max_rounds), exits, sent
+
+# Analyse de chemin façon mtr : seuils alignés sur compute_verdict
+PATH_MAX_HOPS = 30
+PATH_JUMP_MS = 10
+
+async def trace_path(ip, max_hops=PATH_MAX_HOPS, count=20, interval=0.1, timeout=1, engine=None):
+    """Probes à TTL limité vers tous les sauts en même temps.
+
+    Chaque TTL reçoit `count` probes espacées de `interval`, tous les TTL
+    en parallèle sur la même socket : la durée ne dépend pas du nombre de
+    sauts. Dès que la cible répond à un TTL, les TTL supérieurs s'arrêtent.
+    Renvoie une liste de sauts (ttl, ip du routeur le plus fréquent, stats
+    au format detailed_ping_test, 'destination' si la cible y a répondu),
+    sans les sauts muets en fin de chemin.
+    """
+    hops = {ttl: (StreamingStats(), {}) for ttl in range(1, max_hops + 1)}
+    reached = [max_hops]
+
+    async with transport_scope(engine) as engine:
+        if not engine.hop_probes:
+            raise ValueError(f"le transport {engine.name} ne gère pas les probes à TTL limité")
+
+        async def probe(ttl):
+            rtt = await engine.probe(ip, timeout, ttl)
+            responder = engine.last_responder
+            stats, responders = hops[ttl]
+            stats.add(rtt)
+            if responder:
+                responders[responder] = responders.get(responder, 0) + 1
+                if responder == ip:
+                    reached[0] = min(reached[0], ttl)
+
+        async def run(ttl):
+            await asyncio.sleep(interval * (ttl - 1) / max_hops)
+            tasks = []
+            for i in range(count):
+                if i:
+                    await asyncio.sleep(interval)
+                if ttl > reached[0]:
+                    break
+                tasks.append(asyncio.ensure_future(probe(ttl)))
+            await asyncio.gather(*tasks)
+
+        await asyncio.gather(*(run(ttl) for ttl in hops))
+
+    path = [{'ttl': ttl, 'ip': max(responders, key=responders.get) if responders else None,
+             'destination': ip in responders, **stats.to_dict()}
+            for ttl, (stats, responders) in hops.items() if ttl <= reached[0]]
+    while path and not path[-1]['samples']:
+        path.pop()
+    return path
+
+def first_persistent(hops, bad):
+    """Premier saut `bad` dont tous les sauts suivants sont aussi `bad`"""
+    for i, hop in enumerate(hops):
+        if bad(hop) and all(bad(h) for h in hops[i:]):
+            return hop
+    return None
+
+def locate_degradation(path):
+    """Saut où chaque dégradation apparaît : [(problème, saut)].
+
+    Un saut ne compte que si le problème persiste jusqu'à la destination :
+    un routeur qui limite ses réponses ICMP montre de la perte sans
+    dégrader les sauts suivants. Sans réponse de la destination, rien ne
+    dit qu'un problème persiste : aucun saut n'est mis en cause.
+    """
+    hops = [hop for hop in path if hop['samples']]
+    if not hops or not hops[-1].get('destination'):
+        return []
+    findings = []
+    for label, bad in (
+        ("Perte", lambda h: h['loss'] > 0.5),
+        ("Jitter", lambda h: h['jitter'] > 5),
+        ("P99", lambda h: h['p99'] > 60),
+    ):
+        hop = first_persistent(hops, bad)
+        if hop:
+            findings.append((label, hop))
+
+    # Latence : le plus gros palier qui se retrouve jusqu'à la destination
+    jump, where, previous = PATH_JUMP_MS, None, 0
+    for i, hop in enumerate(hops):
+        added = hop['avg'] - previous
+        if added > jump and all(h['avg'] > hop['avg'] - PATH_JUMP_MS / 2 for h in hops[i:]):
+            jump, where = added, hop
+        previous = max(previous, hop['avg'])
+    if where:
+        findings.append((f"Latence +{jump:.0f}ms", where))
+    return findings
+
+def print_path(target, path, findings, elapsed):
+    """Tableau des sauts et attribution des dégradations"""
+    print(f"\n🛰️  CHEMIN → {target} ({len(path)} sauts, {elapsed:.1f}s)")
+    print("=" * 62)
+    print(f"{'Saut':>4}  {'Routeur':<16} {'Perte':>6} {'Moy':>7} {'Jitter':>7} {'P99':>7}")
+    for hop in path:
+        if not hop['samples']:
+            print(f"{hop['ttl']:>4}  {'*':<16} {'100%':>6}")
+            continue
+        line = (f"{hop['ttl']:>4}  {hop['ip']:<16} {hop['loss']:5.0f}% {hop['avg']:5.1f}ms "
+                f"{hop['jitter']:5.1f}ms {hop['p99']:5.0f}ms")
+        print(color(line, 'yellow') if any(h is hop for _, h in findings) else line)
+
+    reached = bool(path) and path[-1].get('destination')
+    if not reached:
+        print(color("\nDestination non atteinte", 'red'))
+    print("\n📍 LOCALISATION")
+    print('-----------------------')
+    if not reached:
+        print(color("   Destination muette : aucun saut ne peut être mis en cause", 'yellow'))
+    elif not findings:
+        print(color("   Aucune dégradation persistante sur le chemin", 'green'))
+    for label, hop in findings:
+        where = "votre réseau local" if hop['ttl'] == 1 else f"saut {hop['ttl']}"
+        print(f"   • {label} à partir de {where} ({hop['ip']})")
+
+def run_path_analysis(server_ip):
+    """Analyse de chemin vers un serveur"""
+    ip = resolve_ip(server_ip)
+    start = time.perf_counter()
+    path = run_async(trace_path(ip))
+    print_path(ip, path, locate_degradation(path), time.perf_counter() - start)
+
+def resolve_ip(host):
+    """Résout un nom d'hôte (les IP sont renvoyées telles quelles)"""
+    try:
+        return socket.gethostbyname(host)
+    except (OSError, UnicodeError):
+        return host
+
+def run_async(coro):
+    """Exécute une coroutine (boucle selector requise pour add_reader sous Windows)"""
+    if sys.platform == 'win32':
+        loop = asyncio.SelectorEventLoop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+    return asyncio.run(coro)
+
+async def detailed_run(ip, samples=500, rate=128, log=None, engine=None, bucket=None):
+    """Série détaillée vers une IP résolue (None si aucune réponse)"""
+    stats = StreamingStats()
+    windows = [SlidingWindow(span) for span in WINDOW_SPANS]
+    
+    def on_sample(t, rtt):
+        for window in windows:
+            window.add(t, rtt)
+        if log:
+            log.add(t, rtt)
+        emit('sample', ip=ip, t=t, rtt=rtt)
+    
+    # Mémoire constante : les RTT ne vivent que dans les stats et les fenêtres
+    _, cadence = await paced_test(ip, samples, rate, timeout=1, on_reply=stats.add, keep=False,
+                                  on_sample=on_sample, engine=engine, bucket=bucket)
+    if not stats.count:
+        return None
+    
+    return {
+        'ip': ip,
+        **stats.to_dict(),
+        # Pire fenêtre de chaque durée couverte par le run
+        'windows': {f"{window.span}s": window.worst for window in windows if window.worst},
+        'cadence': cadence
+    }
+
+def detailed_ping_test(server_ip, samples=500, rate=128, log_path=None):
+    """Test complet pour analyse (cadence fixe façon tickrate CS2)"""
+    log = None
+    try:
+        ip = resolve_ip(server_ip)
+        log = SampleLog(log_path, ip, rate) if log_path else None
+        return run_async(detailed_run(ip, samples, rate, log))
+    except Exception as e:
+        print(f"❌ Erreur: {e}")
+        return None
+    finally:
+        if log:
+            log.close()
+
+def aggregate_pop(relay_pings):
+    """Score d'un POP à partir du ping moyen de chacun de ses relais"""
+    best_ip = min(relay_pings, key=relay_pings.get)
+    values = list(relay_pings.values())
+    return {
+        'best': relay_pings[best_ip],
+        'best_ip': best_ip,
+        'median': statistics.median(values),
+        'spread': max(values) - min(values),
+        'relays': len(values)
+    }
+
+def shard_init(events):
+    """Initialisation d'un processus de scan : ses événements partent dans
+    `events` (file multiprocessing), ou nulle part sans flux NDJSON"""
+    global EVENTS
+    EVENTS = EventQueue(events) if events is not None else None
+
+def scan_shard(ips, count, transport, relay_ports, counts=None):
+    """Processus de scan : sa propre boucle, sa propre socket, sans GIL partagé.
+
+    Les échantillons sont publiés dès leur mesure, horodatés dans le
+    processus, et relayés vers le flux du parent (voir sharded_scan).
+    """
+    global DEFAULT_TRANSPORT
+    DEFAULT_TRANSPORT = transport
+    RELAY_PORTS.update(relay_ports)
+    return run_async(scan_targets(ips, count=count, counts=counts))
+
+def sharded_scan(ips, count=10, workers=None, on_result=None, counts=None):
+    """Répartit les cibles sur plusieurs processus et fusionne les résultats.
+
+    Les cibles sont triées puis distribuées en round-robin : le découpage
+    ne dépend que de la liste, et les résultats de chaque shard sont
+    remontés dans l'ordre des IP. Avec un flux NDJSON, un thread relaie
+    les événements des processus au fil du scan.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    ips = sorted(dict.fromkeys(ips))
+    workers = max(1, min(workers or os.cpu_count() or 1, len(ips)))
+    shards = [ips[i::workers] for i in range(workers)]
+    ports = {ip: RELAY_PORTS[ip] for ip in ips if ip in RELAY_PORTS}
+    results = {}
+    events = relay = None
+    if EVENTS:
+        events = multiprocessing.Queue(NDJSON_QUEUE_MAX)
+        writer = EVENTS
+
+        def forward():
+            for event in iter(events.get, None):
+                writer.emit(event)
+
+        relay = threading.Thread(target=forward, daemon=True)
+        relay.start()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=shard_init, initargs=(events,)) as pool:
+            futures = [pool.submit(scan_shard, shard, count, DEFAULT_TRANSPORT, ports,
+                                   {ip: counts[ip] for ip in shard if ip in counts} if counts else None)
+                       for shard in shards]
+            for future in as_completed(futures):
+                for ip, rtts in sorted(future.result().items()):
+                    results[ip] = rtts
+                    if on_result:
+                        on_result(ip, rtts)
+    finally:
+        if relay:
+            # Les processus sont terminés : leurs événements précèdent la fin
+            events.put(None)
+            relay.join(NDJSON_CLOSE_TIMEOUT)
+    return results
+
+# Références par relais (EWMA de la latence, variance, dernière mesure),
+# conservées d'un scan à l'autre pour ne resonder que ce qui est incertain
+BASELINE_ALPHA = 0.1        # Poids d'un nouvel échantillon dans l'EWMA
+BASELINE_MAX_AGE = 86400    # Au-delà, le relais est rescanné en entier
+BASELINE_DRIFT = 2.0        # Incertitude ajoutée par heure sans mesure (ms)
+BASELINE_TARGET = 2.0       # Précision visée (demi-intervalle, ms) pour le podium
+BASELINE_FULL = 10          # Probes d'un relais inconnu ou périmé (= scan complet)
+BASELINE_CONTENDER = 3      # Minimum pour un prétendant au podium
+
+def baseline_path(transport=None):
+    # Une référence par transport : le réseau simulé ne pollue pas l'ICMP
+    return os.path.join(CACHE_DIR, f"baselines_{transport or DEFAULT_TRANSPORT}.json")
+
+def load_baselines(path=None):
+    """Références par relais {ip: {'ewma', 'var', 'samples', 'seen'}} ({} si absentes)"""
+    try:
+        with open(path or baseline_path(), encoding='utf-8') as f:
+            store = json.load(f)
+        if isinstance(store, dict):
+            return store
+    except (OSError, ValueError):
+        pass
+    return {}
+
+def save_baselines(store, path=None):
+    """Écriture atomique, comme le cache SDR"""
+    path = path or baseline_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(store, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+def update_baseline(store, ip, rtts, now=None):
+    """Ajoute les RTT d'un scan à l'EWMA/variance exponentielle du relais.
+
+    Si leur moyenne sort de l'intervalle de la référence (changement de
+    route), la référence repart de ces seuls échantillons. Renvoie
+    (référence, changement détecté).
+    """
+    times = [t for t in rtts if t is not None]
+    if not times:
+        return store.get(ip), False
+    entry = store.get(ip)
+    shifted = False
+    if entry:
+        fresh = statistics.mean(times)
+        margin = baseline_uncertainty(entry, now) + 2 * math.sqrt(max(entry['var'], 0.25) / len(times))
+        shifted = abs(fresh - entry['ewma']) > margin
+    if shifted:
+        entry = {'ewma': fresh, 'var': statistics.variance(times) if len(times) > 1 else 0.0,
+                 'samples': len(times)}
+    else:
+        entry = entry or {'ewma': times[0], 'var': 0.0, 'samples': 0}
+        for rtt in times:
+            diff = rtt - entry['ewma']
+            incr = BASELINE_ALPHA * diff
+            entry['ewma'] += incr
+            entry['var'] = (1 - BASELINE_ALPHA) * (entry['var'] + diff * incr)
+        entry['samples'] += len(times)
+    entry['seen'] = now or time.time()
+    store[ip] = entry
+    return entry, shifted
+
+def baseline_uncertainty(entry, now=None):
+    """Demi-intervalle (~95 %, ms) de la latence du relais, élargi avec l'âge"""
+    hours = max(0, (now or time.time()) - entry['seen']) / 3600
+    effective = min(entry['samples'], 1 / BASELINE_ALPHA)
+    # Plancher de variance : quelques échantillons identiques ne prouvent rien
+    return 2 * math.sqrt(max(entry['var'], 0.25) / effective + (BASELINE_DRIFT * hours) ** 2)
+
+def plan_probes(pop_relays, store, top_k=3, now=None):
+    """Probes par relais pour un rescan incrémental : {ip: nombre}.
+
+    Un relais inconnu ou plus vieux que BASELINE_MAX_AGE reçoit un scan
+    complet. Sinon le nombre suit la vétusté de la référence, et pour les
+    POPs qui peuvent encore entrer dans le top-k, la variance à réduire
+    jusqu'à BASELINE_TARGET. Un POP stable et clairement battu ne reçoit
+    qu'une probe de contrôle par relais.
+    """
+    now = now or time.time()
+    bounds = {}
+    for server_id, relays in pop_relays.items():
+        entries = [store.get(ip) for ip in relays]
+        if all(entries):
+            values = [e['ewma'] for e in entries]
+            spans = [baseline_uncertainty(e, now) for e in entries]
+            bounds[server_id] = (min(v - h for v, h in zip(values, spans)),
+                                 statistics.median(v + h for v, h in zip(values, spans)))
+    uppers = sorted(upper for _, upper in bounds.values())
+    threshold = uppers[top_k - 1] if len(uppers) >= top_k else math.inf
+
+    counts = {}
+    for server_id, relays in pop_relays.items():
+        contender = server_id not in bounds or bounds[server_id][0] <= threshold
+        for ip in relays:
+            entry = store.get(ip)
+            age = now - entry['seen'] if entry else math.inf
+            if age > BASELINE_MAX_AGE:
+                counts[ip] = BASELINE_FULL
+                continue
+            n = math.ceil(BASELINE_FULL * age / BASELINE_MAX_AGE)
+            if contender:
+                n = max(n + math.ceil(4 * entry['var'] / BASELINE_TARGET ** 2), BASELINE_CONTENDER)
+            counts[ip] = min(max(n, 1), BASELINE_FULL)
+    return counts
+
+# Élagage géographique : un RTT ne peut pas battre la lumière dans la fibre
+# (~2/3 de c, soit 100 km de distance par ms d'aller-retour)
+GEO_KM_PER_MS = 100
+GEO_ANCHORS = 6     # POPs sondés d'abord pour situer le client
+GEO_GRID = 2.5      # Pas (degrés) de la grille des positions possibles
+GEO_BATCH = 8       # POPs sondés par tour, du plus prometteur au moins prometteur
+GEO_STRETCH = 2.0   # Allongement typique des routes (position affichée seulement)
+
+def great_circle_km(a, b):
+    """Distance orthodromique entre deux points [longitude, latitude]"""
+    lon1, lat1, lon2, lat2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371 * math.asin(min(1, math.sqrt(h)))
+
+def unit_vector(geo):
+    """Point [longitude, latitude] sur la sphère unité : le produit scalaire
+    de deux vecteurs est le cosinus de leur angle au centre"""
+    lon, lat = math.radians(geo[0]), math.radians(geo[1])
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+def pick_anchors(geos, n=GEO_ANCHORS):
+    """POPs d'ancrage bien répartis (le plus éloigné des précédents à chaque fois)"""
+    ids = sorted(geos)
+    anchors = ids[:1]
+    while len(anchors) < min(n, len(ids)):
+        anchors.append(max((sid for sid in ids if sid not in anchors),
+                           key=lambda sid: min(great_circle_km(geos[sid], geos[a]) for a in anchors)))
+    return anchors
+
+def within(points, anchor_rtts, geos):
+    """Points compatibles avec le RTT minimal de chaque ancre : à moins de
+    RTT × GEO_KM_PER_MS (plus une demi-maille de grille) de l'ancre"""
+    slack = GEO_GRID * 111 * 0.71
+    limits = [(unit_vector(geos[sid]), math.cos(min(math.pi, (rtt * GEO_KM_PER_MS + slack) / 6371)))
+              for sid, rtt in anchor_rtts.items()]
+    return [p for p in points if all(p[0] * v[0] + p[1] * v[1] + p[2] * v[2] >= limit for v, limit in limits)]
+
+def location_grid():
+    """Grille mondiale des positions possibles du client (vecteurs unité)"""
+    return [unit_vector((-180 + (i + 0.5) * GEO_GRID, -90 + (j + 0.5) * GEO_GRID))
+            for i in range(int(360 / GEO_GRID)) for j in range(int(180 / GEO_GRID))]
+
+def pop_distances(geos):
+    """Distances (km) entre tous les POPs : {a: {b: km}}"""
+    vectors = {sid: unit_vector(geo) for sid, geo in geos.items()}
+    return {a: {b: 6371 * math.acos(max(-1.0, min(1.0, u[0] * v[0] + u[1] * v[1] + u[2] * v[2])))
+                for b, v in vectors.items()}
+            for a, u in vectors.items()}
+
+def geo_lower_bounds(anchor_rtts, ids, distances):
+    """RTT minimal (ms) de chaque POP de `ids` : le client est à moins de
+    RTT × GEO_KM_PER_MS de chaque POP mesuré, donc au moins à la distance
+    entre les deux POPs moins ce rayon (inégalité triangulaire)"""
+    return {sid: max(0.0, max(distances[a][sid] / GEO_KM_PER_MS - rtt for a, rtt in anchor_rtts.items()))
+            for sid in ids}
+
+def estimate_location(points, anchor_rtts, geos):
+    """Position possible la plus cohérente avec les RTT des ancres (affichage),
+    en [longitude, latitude]"""
+    anchors = [(unit_vector(geos[sid]), rtt) for sid, rtt in anchor_rtts.items()]
+    best = min(points, key=lambda p: sum(
+        (rtt - GEO_STRETCH * 6371 * math.acos(max(-1.0, min(1.0, p[0] * v[0] + p[1] * v[1] + p[2] * v[2])))
+         / GEO_KM_PER_MS) ** 2 for v, rtt in anchors))
+    return (math.degrees(math.atan2(best[1], best[0])), math.degrees(math.asin(max(-1.0, min(1.0, best[2])))))
+
+async def geo_scan(pop_relays, geos, count=10, counts=None, on_result=None, engine=None,
+                   interval=0.1, timeout=2):
+    """Scan élagué par la géographie, en flux continu.
+
+    Les ancres (et les POPs sans coordonnées) partent d'abord. Chaque
+    réponse reçue borne la distance au client, donc le RTT plancher des
+    autres POPs (distances entre POPs calculées avant le premier envoi :
+    rien de coûteux ne tourne pendant que des probes sont en vol, la
+    position n'est estimée qu'à la fin). Dès qu'un POP lancé a répondu,
+    le suivant (plancher le plus bas) part, sans attendre la fin des
+    probes ni les timeouts des POPs déjà lancés : au plus GEO_BATCH POPs
+    attendent leur première réponse. Un POP dont le plancher ne peut plus
+    battre le meilleur score mesuré jusque-là n'est pas sondé.
+    Renvoie (POPs élagués {id: plancher}, position estimée ou None).
+    """
+    geos = {sid: geo for sid, geo in geos.items() if geo and sid in pop_relays}
+    results, replies = {}, {}
+    budget = asyncio.Semaphore(MAX_IN_FLIGHT)
+    changed = asyncio.Event()
+    tasks, launched = [], {}
+
+    def score(sid):
+        means = [statistics.mean(replies[ip]) for ip in pop_relays[sid] if replies.get(ip)]
+        return statistics.median(means) if means else math.inf
+
+    def answered(sid):
+        return any(replies.get(ip) for ip in pop_relays[sid])
+
+    distances = pop_distances(geos)
+    anchor_rtts = {}
+    async with transport_scope(engine) as engine:
+        async def run(sid, ip):
+            def on_reply(rtt):
+                if rtt is None:
+                    return
+                # Réveil de l'ordonnanceur seulement si un plancher ou un POP en attente change
+                if not replies.get(ip) or (sid in geos and rtt < anchor_rtts.get(sid, math.inf)):
+                    changed.set()
+                replies.setdefault(ip, []).append(rtt)
+                if sid in geos:
+                    anchor_rtts[sid] = min(rtt, anchor_rtts.get(sid, math.inf))
+            rtts = await ping_target(engine, ip, counts.get(ip, count) if counts else count,
+                                     interval, timeout, budget, on_reply=on_reply)
+            results[ip] = rtts
+            if on_result:
+                on_result(ip, rtts)
+            changed.set()
+
+        def launch(ids):
+            for sid in ids:
+                launched[sid] = [asyncio.ensure_future(run(sid, ip)) for ip in pop_relays[sid]
+                                 if ip not in results]
+                tasks.extend(launched[sid])
+
+        def waiting():
+            # POPs lancés encore sans réponse (et pas encore perdus)
+            return sum(1 for sid, runs in launched.items()
+                       if not answered(sid) and not all(task.done() for task in runs))
+
+        anchors = pick_anchors(geos)
+        launch(anchors + [sid for sid in pop_relays if sid not in geos])
+        remaining = [sid for sid in geos if sid not in anchors]
+        pruned = {}
+        while True:
+            await changed.wait()
+            changed.clear()
+            settled = all(task.done() for task in tasks)
+            if remaining and not anchor_rtts and settled:
+                # Aucune ancre joignable : scan complet
+                launch(remaining)
+                remaining = []
+            elif remaining and anchor_rtts:
+                bounds = geo_lower_bounds(anchor_rtts, remaining, distances)
+                best = min((score(sid) for sid in launched), default=math.inf)
+                for sid in remaining:
+                    if bounds[sid] >= best:
+                        pruned[sid] = bounds[sid]
+                remaining = sorted((sid for sid in remaining if sid not in pruned), key=bounds.get)
+                free = GEO_BATCH - waiting()
+                if free > 0:
+                    launch(remaining[:free])
+                    remaining = remaining[free:]
+            if not remaining and all(task.done() for task in tasks):
+                break
+        await asyncio.gather(*tasks)
+    points = within(location_grid(), anchor_rtts, geos) if anchor_rtts else []
+    return pruned, estimate_location(points, anchor_rtts, geos) if points else None
+
+def print_pop(server_data, pop, responding, total, note=""):
+    """Ligne de résultat d'un POP (pop=None : aucun relais n'a répondu)"""
+    if not pop:
+        print(f"❌ {server_data['name']:<15} {server_data['ip']:<15} TIMEOUT{note}")
+        return
+    status = "✅" if pop['median'] < 35 else "⚠️" if pop['median'] < 60 else "❌"
+    print(f"{status} {server_data['name']:<15} {pop['best_ip']:<15} {pop['median']:5.0f}ms "
+          f"(meilleur {pop['best']:.0f}ms, écart {pop['spread']:.0f}ms, {responding}/{total} relais{note})")
+
+def print_ranking(results, region='eu'):
+    """Classement et recommandation : results = [(server_id, server_data, pop)]"""
+    # Tri des POPs par relais médian (représentatif du POP), ordre stable
+    results.sort(key=lambda x: (x[2]['median'], x[2]['best'], x[0]))
+    
+    if results:
+        print("\n🏆 CLASSEMENT")
+        top = 10 if region == 'world' else 3
+        for i, (server_id, server_data, pop) in enumerate(results[:top], 1):
+            medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i:2}."
+            confidence = f" ±{pop['confidence']:.1f}ms" if 'confidence' in pop else ""
+            print(f"{medal} {server_data['name']} - {pop['median']:.0f}ms{confidence} (meilleur relais {pop['best']:.0f}ms)")
+        
+        _, best_data, best_pop = results[0]
+        print(f"\n💡 RECOMMANDATION: {best_data['name']} ({best_pop['median']:.0f}ms)")
+        print(f"   Meilleur relais: {best_pop['best_ip']} ({best_pop['best']:.0f}ms)")
+        print(f"   Commande: python {sys.argv[0]} -s {best_pop['best_ip']}")
+
+def list_all_servers(servers, region='eu', adaptive=False, workers=None, incremental=True, geo=False):
+    """Test rapide des serveurs.
+
+    En mode incrémental, les références des scans précédents décident du
+    nombre de probes par relais (plan_probes) et les scores affichés sont
+    leurs EWMA, avec la marge d'incertitude (±) du meilleur relais.
+    Avec geo, les POPs trop lointains pour battre le meilleur ne sont pas
+    sondés (geo_scan).
+    """
+    region_name = {'eu': "EUROPE", 'us': "US"}.get(region, "MONDE")
+    print(f"\n🌍 SCAN SERVEURS {region_name} (Steam API)")
+    print("=" * 55)
+    
+    results = []
+    pop_relays = {
+        server_id: list(dict.fromkeys(resolve_ip(ip) for ip in server_data.get('relays') or [server_data['ip']]))
+        for server_id, server_data in servers.items()
+    }
+    
+    def report_pop(server_id, pings, note=""):
+        pop = aggregate_pop(dict(sorted(pings.items()))) if pings else None
+        emit('pop', id=server_id, name=servers[server_id]['name'], relays=pings, pop=pop)
+        if pop:
+            if counts is not None:
+                pop['confidence'] = baseline_uncertainty(store[pop['best_ip']], now)
+                note = f", ±{pop['confidence']:.1f}ms{note}"
+            results.append((server_id, servers[server_id], pop))
+        print_pop(servers[server_id], pop, len(pings), len(pop_relays[server_id]), note)
+    
+    # Les scans complets alimentent aussi les références
+    store = load_baselines() if not adaptive else {}
+    now = time.time()
+    counts = plan_probes(pop_relays, store) if incremental and store and not adaptive else None
+    
+    try:
+        if adaptive:
+            stats, exits, sent = run_async(race_scan(pop_relays))
+            for server_id, relay_stats in stats.items():
+                pings = {ip: st.mean for ip, st in relay_stats.items() if st.count}
+                note = f", éliminé au tour {exits[server_id]}" if server_id in exits else ""
+                report_pop(server_id, pings, note)
+            full = 10 * sum(len(relays) for relays in pop_relays.values())
+            print(f"\n📉 Scan adaptatif: {sent} paquets envoyés (scan complet: {full})")
+        else:
+            by_ip = {}
+            relay_pings = {server_id: {} for server_id in servers}
+            remaining = {server_id: len(relays) for server_id, relays in pop_relays.items()}
+            for server_id, relays in pop_relays.items():
+                for ip in relays:
+                    by_ip.setdefault(ip, []).append(server_id)
+            
+            # Relais dont la latence a changé : complétés jusqu'à BASELINE_FULL
+            # probes, puis classés sur la moyenne de ce scan
+            topup, shifted_rtts = {}, {}
+            
+            def on_result(ip, rtts):
+                entry, shifted = update_baseline(store, ip, rtts, now)
+                if ip in shifted_rtts:
+                    rtts, shifted = shifted_rtts.pop(ip) + list(rtts), True
+                elif shifted and counts is not None and counts.get(ip, BASELINE_FULL) < BASELINE_FULL:
+                    shifted_rtts[ip] = list(rtts)
+                    topup[ip] = BASELINE_FULL - counts[ip]
+                    return
+                times = [t for t in rtts if t is not None]
+                for server_id in by_ip[ip]:
+                    if times:
+                        relay_pings[server_id][ip] = (entry['ewma'] if counts is not None and not shifted
+                                                      else statistics.mean(times))
+                    remaining[server_id] -= 1
+                    if remaining[server_id] == 0:
+                        report_pop(server_id, relay_pings[server_id])
+            
+            if geo:
+                pruned, location = run_async(geo_scan(pop_relays, {server_id: server_data.get('geo')
+                                                                   for server_id, server_data in servers.items()},
+                                                      count=10, counts=counts, on_result=on_result))
+                print()
+                if location:
+                    nearest = min((server_id for server_id in servers if servers[server_id].get('geo')),
+                                  key=lambda server_id: great_circle_km(location, servers[server_id]['geo']))
+                    print(f"📍 Position estimée: près de {servers[nearest]['name']} "
+                          f"({location[1]:.0f}°, {location[0]:.0f}°)")
+                for server_id, bound in pruned.items():
+                    emit('pruned', id=server_id, name=servers[server_id]['name'], bound=round(bound, 1))
+                if pruned:
+                    print(f"✂️  {len(pruned)} POPs élagués (au moins {min(pruned.values()):.0f}ms d'après "
+                          f"la distance), {len(servers) - len(pruned)}/{len(servers)} sondés")
+                probed_ips = {ip for server_id, relays in pop_relays.items() if server_id not in pruned for ip in relays}
+                sent = sum(counts.get(ip, 10) if counts is not None else 10 for ip in probed_ips)
+                print(f"📉 Scan géographique: {sent} paquets envoyés "
+                      f"(scan complet: {10 * len(by_ip)}, --full pour l'imposer)")
+            elif region == 'world':
+                # Scan mondial : un processus (et une socket) par cœur
+                sharded_scan(list(by_ip), count=10, workers=workers, on_result=on_result, counts=counts)
+            else:
+                # Tous les relais de tous les POPs partagent une seule socket ICMP
+                run_async(scan_targets(list(by_ip), count=10, on_result=on_result, counts=counts))
+            if topup:
+                print(f"\n🔀 {len(topup)} relais ont changé de latence depuis le dernier scan : "
+                      f"{BASELINE_FULL} probes pour chacun")
+                run_async(scan_targets(list(topup), count=BASELINE_FULL, on_result=on_result, counts=topup))
+            save_baselines(store)
+            if counts is not None and not geo:
+                print(f"\n📉 Scan incrémental: {sum(counts.values()) + sum(topup.values())} paquets envoyés "
+                      f"(scan complet: {10 * len(by_ip)}, --full pour l'imposer)")
+    except OSError as e:
+        print(color(f"❌ Socket ICMP indisponible: {e} (droits admin/root requis)", 'red'))
+        return []
+    
+    print_ranking(results, region)
+    emit('ranking', region=region, pops=[{'id': server_id, 'name': server_data['name'], **pop}
+                                         for server_id, server_data, pop in results])
+    return results
+
+def compute_verdict(data):
+    """Problèmes critiques et avertissements selon les seuils CS2"""
+    critical_issues = []
+    warnings = []
+
+    if data['loss'] > 0.5:
+        critical_issues.append(f"Perte {data['loss']:.1f}% → hitreg défaillant")
+    if data['avg'] > 35:
+        critical_issues.append(f"Ping {data['avg']:.0f}ms → désavantage peek")
+    if data['max'] > 80:
+        critical_issues.append(f"Pic {data['max']:.0f}ms → freeze possible")
+    if data['jitter'] > 8:
+        critical_issues.append(f"Jitter {data['jitter']:.1f}ms → aim instable")
+    if data['p99'] > 60:
+        critical_issues.append(f"P99 {data['p99']:.0f}ms → lags réguliers")
+    if data['spikes'] > 2:
+        critical_issues.append(f"{data['spikes']} pics → micro-freezes")
+
+    if data['avg'] > 25:
+        warnings.append("Ping élevé pour le compétitif")
+    if data['jitter'] > 5:
+        warnings.append("Micro-variations détectées")
+    if data['p95'] > 45:
+        warnings.append("Quelques ralentissements")
+    # Dégradation passagère noyée dans les stats globales (fenêtre la plus longue d'abord)
+    for span, window in reversed(list((data.get('windows') or {}).items())):
+        if window['p99'] > 60 >= data['p99'] or window['jitter'] > 8 >= data['jitter']:
+            warnings.append(f"Dégradation passagère sur {span} vers {window['t']:.0f}s "
+                            f"(P99 {window['p99']:.0f}ms, jitter {window['jitter']:.1f}ms)")
+            break
+    
+    return critical_issues, warnings
+
+def summary_event(data, **extra):
+    """Événement 'summary' : champs de detailed_ping_test et verdict"""
+    if not EVENTS:
+        return
+    critical_issues, warnings = compute_verdict(data)
+    _, grade, _ = LATENCY_GRADES[latency_grade(data['avg'])]
+    emit('summary', **data, **extra,
+         verdict={'critical': critical_issues, 'warnings': warnings, 'grade': grade})
+
+def analyze_results(data):
+    """Analyse des résultats"""
+    print(f"\n📊 RÉSULTATS")
+    print('-----------------------')
+    print(f"Perte        : {data['loss']:.1f}% ({data['samples']}/{data.get('sent', 500)})")
+    print(f"Ping moyen   : {data['avg']:.0f}ms")
+    print(f"Min / Max    : {data['min']:.0f} / {data['max']:.0f}ms")
+    print(f"Jitter       : {data['jitter']:.1f}ms")
+    print(f"95e percentile: {data['p95']:.0f}ms")
+    print(f"99e percentile: {data['p99']:.0f}ms")
+    print(f"Pics détectés: {data['spikes']}")
+    
+    # VERDICT CS2
+    print(f"\n🎯 VERDICT")
+    print('-----------------------')
+    
+    critical_issues, warnings = compute_verdict(data)
+    
+    if critical_issues:
+        for issue in critical_issues:
+            print(color(f"   • {issue}", 'yellow'))
+        print("\n🔧 ACTIONS:")
+        print('-----------------------')
+        print("   • Changer de serveur/région")
+        print("   • Vérifier rate/interp settings")
+        print("   • Tester connexion Ethernet")
+        if data.get('ip'):
+            print(f"   • Localiser le saut fautif : python lagtest.py --path {data['ip']}")
+    elif warnings:
+        for warning in warnings:
+            print(f"   • {warning}")
+        print("\n💡 RECOMMANDATIONS:")
+        print('-----------------------')
+        print("   • Éviter les duels serrés")
+        print("   • Privilégier le jeu défensif")
+        if data['avg'] > 25:
+            print("   • Considérer un serveur plus proche")
+    else:
+        if data['avg'] <= 15:
+            print("   🏆 Ping excellent pour le pro play")
+        elif data['avg'] <= 25:
+            print("   🎯 Parfait pour le matchmaking")
+        print("   ⚡ Hitreg fiable • Peeks réactifs")
+    
+    # Analyse technique
+    print(f"\n⚙️  DÉTAILS TECHNIQUES")
+    print('-----------------------')
+    print(f"Variation max    : {data['max'] - data['min']:.0f}ms")
+    print(f"Stabilité        : {100 - (data['jitter']/data['avg']*100):.0f}%")
+    if data.get('cadence'):
+        cadence = data['cadence']
+        print(f"Cadence          : {cadence['achieved_rate']:.0f}/{cadence['rate']} Hz "
+              f"(dérive moy {cadence['drift_avg']:.2f}ms, max {cadence['drift_max']:.2f}ms)")
+        if cadence.get('clocks'):
+            labels = {'kernel': 'noyau', 'kernel-rx': 'noyau (réception seule)',
+                      'user': 'espace utilisateur', 'sim': 'simulée'}
+            clocks = ", ".join(f"{labels.get(k, k)} {n}" for k, n in sorted(cadence['clocks'].items()))
+            print(f"Horodatage RTT   : {clocks}")
+    for span, window in (data.get('windows') or {}).items():
+        print(f"Pire fenêtre {span:<4}: P99 {window['p99']:.0f}ms, jitter {window['jitter']:.1f}ms, "
+              f"max {window['max']:.0f}ms, perte {window['loss']:.1f}% (fin à {window['t']:.1f}s)")
+    
+    # Grade CS2
+    _, label, tint = LATENCY_GRADES[latency_grade(data['avg'])]
+    print(f"Grade        : {color(label, tint)}")
+    
+    if data.get('self_profile'):
+        print_self_profile(data['self_profile'], data)
+    print("\n")
+
+def show_main_menu():
+    """Menu principal"""
+    print("\n\nCS2 NETWORK ANALYZER\n")
+    print("=" * 40)
+    print(color("\n1. 🌍 Lister les serveurs EU", 'yellow'))
+    print(color("2. 🌍 Lister les serveurs US", 'yellow'))
+    print(color("3. 📚 Guide réseau", 'yellow'))
+    print(color("4. 🎮 Tester un serveur spécifique", 'yellow'))
+    print(color("5. ❌ Quitter", 'red'))
+    
+    while True:
+        try:
+            choice = input("\nChoix (1-5): ").strip()
+            
+            if choice == "1":
+                servers = fetch_cs2_servers('eu')
+                list_all_servers(servers, 'eu')
+                break            
+            elif choice == "2":
+                servers = fetch_cs2_servers('us')
+                list_all_servers(servers, 'us')
+                break
+            elif choice == "3":
+                show_help()
+                break
+            elif choice == "4":
+                servers = fetch_cs2_servers('eu')
+                show_server_menu(servers)
+                break
+            elif choice == "5":
+                print("Au revoir !")
+                sys.exit(0)
+            else:
+                print(color("Choix invalide (1-5)", 'red'))
+        except KeyboardInterrupt:
+            print("\nAu revoir !")
+            break
+
+def show_server_menu(servers):
+    """Menu de sélection de serveur"""
+    print("\n🎮 SERVEURS DISPONIBLES:")
+    server_list = list(servers.items())
+    
+    for i, (server_id, server_data) in enumerate(server_list, 1):
+        print(f"{i:2}. {server_data['name']:<15} ({server_data['ip']})")
+    
+    print(f"{len(servers)+1:2}. IP personnalisée")
+    
+    while True:
+        try:
+            choice = input(f"\nChoisir un serveur (1-{len(servers)+1}): ").strip()
+            
+            if choice.isdigit():
+                choice_num = int(choice)
+                if 1 <= choice_num <= len(servers):
+                    server_id, server_data = server_list[choice_num - 1]
+                    run_detailed_test(server_data['name'], server_data['ip'])
+                    break
+                elif choice_num == len(servers) + 1:
+                    custom_ip = input("IP du serveur: ").strip()
+                    if custom_ip:
+                        run_detailed_test(f"Serveur personnalisé", custom_ip)
+                        break
+                    else:
+                        print(color("❌ IP invalide", 'red'))
+                else:
+                    print(f"❌ Choix invalide (1-{len(servers)+1})")
+            else:
+                print(f"❌ Entrez un nombre (1-{len(servers)+1})")
+        except KeyboardInterrupt:
+            print("\n👋 Retour au menu")
+            break
+
+def run_detailed_test(server_name, server_ip, rate=128, log_path=None):
+    """Lance un test détaillé"""
+    print(f"\n Test du serveur → {server_name} ({server_ip}) @ {rate} Hz")
+    print("=" * 50)
+    
+    if PROFILE:
+        PROFILE.start()
+    try:
+        data = detailed_ping_test(server_ip, rate=rate, log_path=log_path)
+    finally:
+        if PROFILE:
+            PROFILE.stop()
+    if data and PROFILE:
+        data['self_profile'] = PROFILE.summary()
+    if log_path:
+        print(f"💾 Échantillons enregistrés dans {log_path}")
+    
+    if data:
+        summary_event(data)
+        analyze_results(data)
+    else:
+        emit('unreachable', ip=server_ip)
+        print(color("SERVEUR INACCESSIBLE", 'red'))
+
+# Budget global des tests multi-cibles : 4 tests à 128 Hz en même temps
+PPS_BUDGET = 512
+
+def parse_targets(specs, region='eu', config_file=None):
+    """Cibles de -s : IP/nom d'hôte, fichier (une IP par ligne, # commentaire)
+    ou topK (meilleurs relais des K premiers POPs d'un scan de la région)"""
+    targets = []
+    for spec in specs:
+        top = spec.lower()
+        if top.startswith('top') and top[3:].isdigit():
+            servers = fetch_cs2_servers(region, config_file)
+            for _, server_data, pop in list_all_servers(servers, region)[:int(top[3:])]:
+                targets.append((server_data['name'], pop['best_ip']))
+        elif os.path.isfile(spec):
+            with open(spec, encoding='utf-8') as f:
+                for line in f:
+                    ip = line.split('#', 1)[0].strip()
+                    if ip:
+                        targets.append((ip, ip))
+        else:
+            targets.append((spec, spec))
+    return list(dict((ip, (name, ip)) for name, ip in targets).values())
+
+async def multi_detailed_runs(ips, samples=500, rate=128, pps=PPS_BUDGET, logs=None, engine=None):
+    """Tests détaillés concurrents sous un budget global de paquets/s.
+
+    Autant de tests tournent à la fois que le budget le permet à leur
+    cadence pleine (les suivants attendent une place), donc chacun garde la
+    cadence d'un test seul ; leurs grilles d'envoi sont décalées pour
+    s'intercaler, et le seau à jetons partagé fait respecter le plafond.
+    Un budget inférieur à la cadence d'un seul test est refusé : le seau
+    ralentirait chaque cible sous sa cadence nominale.
+    """
+    if pps < rate:
+        raise ValueError(f"budget de {pps} paquets/s inférieur à la cadence d'un test ({rate} Hz)")
+    parallel = max(1, min(len(ips), int(pps // rate)))
+    slots = asyncio.Semaphore(parallel)
+    bucket = TokenBucket(pps)
+    logs = logs or {}
+    async with transport_scope(engine) as engine:
+        async def one(i, ip):
+            async with slots:
+                await asyncio.sleep(i % parallel / (rate * parallel))
+                return await detailed_run(ip, samples, rate, logs.get(ip), engine, bucket)
+        results = await asyncio.gather(*(one(i, ip) for i, ip in enumerate(ips)))
+    return dict(zip(ips, results)), parallel, bucket
+
+def run_multi_test(targets, rate=128, pps=PPS_BUDGET, log_path=None):
+    """Tests détaillés de plusieurs serveurs en parallèle, puis comparaison"""
+    targets = [(name, resolve_ip(ip)) for name, ip in targets]
+    ips = [ip for _, ip in targets]
+    logs = {}
+    if log_path:
+        logs = {ip: SampleLog(log_path_for(log_path, ip, True), ip, rate) for ip in ips}
+    parallel = max(1, min(len(ips), int(pps // rate)))
+    print(f"\n Test de {len(ips)} serveurs @ {rate} Hz, budget {pps} paquets/s ({parallel} en parallèle)")
+    print("=" * 50)
+    start = time.perf_counter()
+    if PROFILE:
+        PROFILE.start()
+    try:
+        results, _, bucket = run_async(multi_detailed_runs(ips, rate=rate, pps=pps, logs=logs))
+    finally:
+        if PROFILE:
+            PROFILE.stop()
+        for log in logs.values():
+            log.close()
+            print(f"💾 Échantillons enregistrés dans {log.path}")
+    print(f"Durée totale : {time.perf_counter() - start:.1f}s (attentes de jeton : {bucket.waits})")
+    
+    for name, ip in targets:
+        print(f"\n Test du serveur → {name} ({ip})")
+        print("=" * 50)
+        if results[ip]:
+            summary_event(results[ip])
+            analyze_results(results[ip])
+        else:
+            emit('unreachable', ip=ip)
+            print(color("SERVEUR INACCESSIBLE", 'red'))
+    
+    print("\n⚖️  COMPARAISON")
+    print('-----------------------')
+    print(f"{'Serveur':<20} {'IP':<16} {'Ping':>6} {'Jitter':>7} {'P99':>6} {'Perte':>6}  Grade")
+    ranked = sorted(targets, key=lambda t: results[t[1]]['avg'] if results[t[1]] else math.inf)
+    for name, ip in ranked:
+        data = results[ip]
+        if not data:
+            print(f"{name[:20]:<20} {ip:<16} {color('INACCESSIBLE', 'red')}")
+            continue
+        _, label, tint = LATENCY_GRADES[latency_grade(data['avg'])]
+        print(f"{name[:20]:<20} {ip:<16} {data['avg']:4.0f}ms {data['jitter']:5.1f}ms "
+              f"{data['p99']:4.0f}ms {data['loss']:5.1f}%  {color(label, tint)}")
+    if PROFILE:
+        # Une seule session pour toutes les cibles : un seul diagnostic
+        profile = PROFILE.summary()
+        emit('self_profile', **profile)
+        print_self_profile(profile)
+
+class RingBuffer:
+    """Tampon circulaire de RTT à taille fixe (array de doubles, NaN = perte)"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = array('d', [math.nan]) * capacity
+        self.index = 0
+        self.count = 0
+
+    def append(self, rtt):
+        self.data[self.index] = math.nan if rtt is None else rtt
+        self.index = (self.index + 1) % self.capacity
+        self.count += 1
+
+    def recent(self, n):
+        """Les n derniers échantillons (au plus `capacity`), du plus ancien au plus récent"""
+        n = min(n, self.count, self.capacity)
+        start = (self.index - n) % self.capacity
+        if start + n <= self.capacity:
+            return self.data[start:start + n]
+        return self.data[start:] + self.data[:self.index]
+
+def window_stats(samples):
+    """Stats (format detailed_ping_test) d'une fenêtre du tampon"""
+    stats = StreamingStats()
+    for rtt in samples:
+        stats.add(None if math.isnan(rtt) else rtt)
+    return stats.to_dict()
+
+# Journal binaire : en-tête fixe puis enregistrements (t_envoi s, RTT ms) en
+# float64, NaN = perte. Tout est aligné sur 8 octets pour un mmap direct.
+LOG_MAGIC = b'CS2LAGv1'
+LOG_HEADER = struct.Struct('<8sdd48s')
+LOG_RECORD = struct.Struct('<dd')
+
+class SampleLog:
+    """Journal d'échantillons en ajout seul (écriture bufferisée)"""
+
+    def __init__(self, path, target, rate):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(LOG_HEADER.pack(LOG_MAGIC, rate, time.time(), target.encode()[:48]))
+
+    def add(self, send_offset, rtt):
+        self.file.write(LOG_RECORD.pack(send_offset, math.nan if rtt is None else rtt))
+
+    def close(self):
+        self.file.close()
+
+class SampleLogReader:
+    """Lecture d'un journal par mmap : rien n'est chargé ni décodé à l'ouverture"""
+
+    def __init__(self, path):
+        import mmap
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(LOG_HEADER.size)
+            if len(header) < LOG_HEADER.size or header[:8] != LOG_MAGIC:
+                raise ValueError(f"{path}: journal lagtest invalide")
+            _, self.rate, self.start_time, target = LOG_HEADER.unpack(header)
+            self.target = target.rstrip(b'\x00').decode(errors='replace')
+            size = os.fstat(f.fileno()).st_size
+            # Un enregistrement tronqué (arrêt brutal) est ignoré
+            self.count = (size - LOG_HEADER.size) // LOG_RECORD.size
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.count else None
+
+    def records(self):
+        """Vue float64 (t_envoi, rtt, t_envoi, rtt, ...) directement sur le fichier"""
+        if not self.mm:
+            return memoryview(b'').cast('d')
+        end = LOG_HEADER.size + self.count * LOG_RECORD.size
+        return memoryview(self.mm)[LOG_HEADER.size:end].cast('d')
+
+    def rtts(self):
+        return self.records()[1::2]
+
+def replay_logs(paths):
+    """Réanalyse des journaux enregistrés (stats de tous les journaux en un lot)"""
+    logs = [SampleLogReader(path) for path in paths]
+    for path, log, data in zip(paths, logs, batch_stats([log.rtts() for log in logs])):
+        started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(log.start_time))
+        print(f"\n📼 REPLAY → {log.target} ({path})")
+        print(f"   {log.count} échantillons @ {log.rate:.0f} Hz, démarré le {started}")
+        print("=" * 50)
+        if data['samples']:
+            analyze_results(data)
+        else:
+            print(color("SERVEUR INACCESSIBLE", 'red'))
+
+def compare_logs(before_path, after_path):
+    """Compare deux journaux (ex : avant/après un changement de routeur)"""
+    before, after = SampleLogReader(before_path), SampleLogReader(after_path)
+    a, b = batch_stats([before.rtts(), after.rtts()])
+    print("\n⚖️  COMPARAISON")
+    print('-----------------------')
+    print(f"Avant : {before.target} ({before_path}, {before.count} échantillons)")
+    print(f"Après : {after.target} ({after_path}, {after.count} échantillons)\n")
+    
+    rows = [
+        ('Perte (%)', 'loss', 1),
+        ('Ping moyen', 'avg', 1),
+        ('Min', 'min', 1),
+        ('Max', 'max', 1),
+        ('Jitter', 'jitter', 2),
+        ('P95', 'p95', 1),
+        ('P99', 'p99', 1),
+        ('Pics', 'spikes', 0),
+    ]
+    print(f"{'':<12} {'Avant':>9} {'Après':>9} {'Δ':>9}")
+    for label, key, digits in rows:
+        if not (a['samples'] and b['samples']):
+            break
+        delta = round(b[key] - a[key], digits)
+        # Toutes ces métriques : plus bas = meilleur
+        tint = 'green' if delta < 0 else 'red' if delta > 0 else None
+        delta_text = f"{delta:+9.{digits}f}"
+        print(f"{label:<12} {a[key]:9.{digits}f} {b[key]:9.{digits}f} {color(delta_text, tint) if tint else delta_text}")
+    
+    for label, data in (("Avant", a), ("Après", b)):
+        if not data['samples']:
+            print(color(f"{label} : SERVEUR INACCESSIBLE", 'red'))
+            continue
+        critical_issues, warnings = compute_verdict(data)
+        print(f"\n{label} : {len(critical_issues)} problème(s) critique(s), {len(warnings)} avertissement(s)")
+        for issue in critical_issues:
+            print(color(f"   • {issue}", 'yellow'))
+
+# Monitoring longue durée : cadence basse pour ne pas gêner le jeu
+MONITOR_RATE = 20
+MONITOR_INTERVAL = 10
+
+def print_monitor_summary(name, ip, data):
+    """Ligne de résumé périodique, avec les seuils du verdict CS2"""
+    stamp = time.strftime('%H:%M:%S')
+    if not data['samples']:
+        emit('unreachable', ip=ip, scope='window')
+        print(f"[{stamp}] {name:<15} {ip:<15} {color('TIMEOUT', 'red')}")
+        return
+    summary_event({'ip': ip, **data}, scope='window')
+    critical_issues, warnings = compute_verdict(data)
+    if critical_issues:
+        verdict = color(f"❌ {critical_issues[0]}", 'red')
+    elif warnings:
+        verdict = color(f"⚠️  {warnings[0]}", 'yellow')
+    else:
+        verdict = color("✅ OK", 'green')
+    windows = data.get('windows') or {}
+    p99s = "/".join(f"{window['p99']:.0f}" for window in windows.values())
+    worst = f"pire p99 {'/'.join(windows)} {p99s}ms  " if windows else ""
+    print(f"[{stamp}] {name:<15} {ip:<15} {data['avg']:5.1f}ms  jitter {data['jitter']:4.1f}ms  "
+          f"p99 {data['p99']:5.1f}ms  perte {data['loss']:4.1f}%  pics {data['spikes']}  {worst}{verdict}")
+
+async def monitor_targets(targets, totals, rate=MONITOR_RATE, interval=MONITOR_INTERVAL,
+                          duration=None, timeout=1, logs=None, engine=None, worst=None):
+    """Sonde les cibles en continu, résumé toutes les `interval` secondes.
+
+    Chaque cible a un tampon circulaire d'une fenêtre de résumé, des
+    stats cumulées en mémoire constante (`totals`) et des fenêtres
+    glissantes (WINDOW_SPANS). Chaque résumé donne les pires fenêtres
+    closes pendant l'intervalle ; `worst` reçoit la pire de chaque durée
+    sur toute la session.
+    """
+    rings = {ip: RingBuffer(max(1, int(rate * interval))) for _, ip in targets}
+    summarized = {ip: 0 for _, ip in targets}
+    windows = {ip: [SlidingWindow(span) for span in WINDOW_SPANS] for _, ip in targets}
+    worst = {} if worst is None else worst
+
+    def sampler(ip):
+        log = (logs or {}).get(ip)
+        def on_sample(t, rtt):
+            for window in windows[ip]:
+                window.add(t, rtt)
+            if log:
+                log.add(t, rtt)
+        return on_sample
+
+    def interval_windows(ip):
+        """Pires fenêtres depuis le dernier résumé, repartant de zéro ensuite"""
+        spans = {}
+        for window in windows[ip]:
+            if window.worst:
+                key = f"{window.span}s"
+                spans[key] = window.worst
+                best_so_far = worst.setdefault(ip, {}).get(key)
+                if not best_so_far or (window.worst['p99'], window.worst['jitter']) > \
+                        (best_so_far['p99'], best_so_far['jitter']):
+                    worst[ip][key] = window.worst
+                window.worst = None
+        return spans
+
+    def recorder(ip):
+        ring, total = rings[ip], totals[ip]
+        def on_reply(rtt):
+            ring.append(rtt)
+            total.add(rtt)
+            emit('sample', ip=ip, rtt=rtt)
+        return on_reply
+
+    async with transport_scope(engine) as engine:
+        probes = [asyncio.ensure_future(paced_probes(engine, ip, None, rate, timeout,
+                                                     recorder(ip), keep=False, on_sample=sampler(ip)))
+                  for _, ip in targets]
+        start = time.monotonic()
+        try:
+            while duration is None or time.monotonic() - start < duration:
+                await asyncio.sleep(interval)
+                for name, ip in targets:
+                    ring = rings[ip]
+                    data = window_stats(ring.recent(ring.count - summarized[ip]))
+                    print_monitor_summary(name, ip, dict(data, windows=interval_windows(ip)))
+                    summarized[ip] = ring.count
+        finally:
+            for probe in probes:
+                probe.cancel()
+            await asyncio.gather(*probes, return_exceptions=True)
+
+def log_path_for(log_path, ip, several):
+    """Un journal par cible : l'IP est insérée avant l'extension si besoin"""
+    if not several:
+        return log_path
+    root, ext = os.path.splitext(log_path)
+    return f"{root}-{ip}{ext}"
+
+def run_monitor(targets, rate=MONITOR_RATE, interval=MONITOR_INTERVAL, duration=None, log_path=None):
+    """Mode --monitor : surveillance continue puis bilan par cible"""
+    targets = [(name, resolve_ip(ip)) for name, ip in targets]
+    print(f"\n📡 MONITORING {len(targets)} cible(s) @ {rate} Hz, résumé toutes les {interval}s (Ctrl+C pour arrêter)")
+    print("=" * 50)
+    totals = {ip: StreamingStats() for _, ip in targets}
+    worst = {}
+    logs = {}
+    if log_path:
+        logs = {ip: SampleLog(log_path_for(log_path, ip, len(targets) > 1), ip, rate) for _, ip in targets}
+    try:
+        run_async(monitor_targets(targets, totals, rate, interval, duration, logs=logs, worst=worst))
+    except KeyboardInterrupt:
+        print(color("\nMonitoring arrêté", 'yellow'))
+    finally:
+        for log in logs.values():
+            log.close()
+            print(f"💾 Échantillons enregistrés dans {log.path}")
+    
+    for name, ip in targets:
+        print(f"\n📋 BILAN → {name} ({ip})")
+        if totals[ip].count:
+            spans = worst.get(ip, {})
+            data = dict(totals[ip].to_dict(),
+                        windows={f"{span}s": spans[f"{span}s"] for span in WINDOW_SPANS if f"{span}s" in spans})
+            summary_event({'ip': ip, **data}, scope='total')
+            analyze_results(data)
+        else:
+            print(color("SERVEUR INACCESSIBLE", 'red'))
+
+# Agent résident : annuaire SDR et estimations glissantes servis en local
+AGENT_SOCKET = os.path.join(CACHE_DIR, 'agent.sock')
+AGENT_REGIONS = ('eu', 'us')
+AGENT_SCAN_INTERVAL = 30    # Rescan des relais (s)
+AGENT_RELAY_HISTORY = 30    # RTT gardés par relais (3 scans de 10)
+AGENT_WATCH_SAMPLES = 500   # Fenêtre glissante des cibles -s (25 s à MONITOR_RATE)
+AGENT_MAX_WATCH = 8
+
+class ProbeAgent:
+    """Agent résident : garde l'annuaire des relais et leurs RTT récents au chaud.
+
+    Les relais de chaque région sont rescannés toutes les `scan_interval`
+    secondes sur un seul transport ouvert une fois pour toutes. Une cible
+    demandée avec -s est ensuite sondée en continu à MONITOR_RATE. Le
+    protocole est une ligne JSON par requête et par réponse.
+    """
+
+    def __init__(self, regions=AGENT_REGIONS, config_file=None, scan_interval=AGENT_SCAN_INTERVAL):
+        self.regions = regions
+        self.config_file = config_file
+        self.scan_interval = scan_interval
+        self.servers = {}
+        self.directory_time = 0
+        self.relays = {}
+        self.scanned = {}
+        self.locks = {region: asyncio.Lock() for region in regions}
+        self.watched = {}
+        self.engine = None
+
+    async def refresh_directory(self):
+        """Recharge l'annuaire quand la copie de la config SDR n'est plus fraîche"""
+        if time.time() - self.directory_time < SDR_CACHE_TTL:
+            return
+        loop = asyncio.get_running_loop()
+        for region in self.regions:
+            self.servers[region] = await loop.run_in_executor(None, fetch_cs2_servers, region, self.config_file)
+        self.directory_time = time.time()
+
+    def pop_relays(self, region):
+        return {server_id: list(dict.fromkeys(server_data.get('relays') or [server_data['ip']]))
+                for server_id, server_data in self.servers[region].items()}
+
+    async def scan(self, region):
+        """Scan complet des relais d'une région, ajouté à leur historique"""
+        async with self.locks[region]:
+            await self.refresh_directory()
+            ips = [ip for relays in self.pop_relays(region).values() for ip in relays]
+            results = await scan_targets(ips, count=10, engine=self.engine)
+            for ip, rtts in results.items():
+                ring = self.relays.setdefault(ip, RingBuffer(AGENT_RELAY_HISTORY))
+                for rtt in rtts:
+                    ring.append(rtt)
+            self.scanned[region] = time.time()
+
+    def ranking(self, region):
+        """POPs de la région avec leur score (format aggregate_pop), dans l'ordre de l'annuaire"""
+        pops = []
+        for server_id, relays in self.pop_relays(region).items():
+            pings = {}
+            for ip in relays:
+                ring = self.relays.get(ip)
+                times = [t for t in ring.recent(ring.capacity) if not math.isnan(t)] if ring else []
+                if times:
+                    pings[ip] = statistics.mean(times)
+            pops.append({
+                'id': server_id,
+                'server': self.servers[region][server_id],
+                'pop': aggregate_pop(dict(sorted(pings.items()))) if pings else None,
+                'responding': len(pings),
+                'total': len(relays),
+            })
+        return pops
+
+    def watch(self, ip):
+        """Sonde une cible en continu (fenêtre glissante pour les -s suivants)"""
+        ring = RingBuffer(AGENT_WATCH_SAMPLES)
+        task = asyncio.ensure_future(paced_probes(self.engine, ip, None, MONITOR_RATE, 1,
+                                                  ring.append, keep=False))
+        if len(self.watched) >= AGENT_MAX_WATCH:
+            # La plus ancienne cible suivie laisse sa place
+            _, oldest = self.watched.pop(next(iter(self.watched)))
+            oldest.cancel()
+        self.watched[ip] = (ring, task)
+
+    async def server(self, ip, fresh=False, rate=128):
+        """Stats d'une cible : fenêtre glissante si elle est suivie, sinon mesure complète"""
+        ip = resolve_ip(ip)
+        if ip in self.watched and not fresh:
+            ring, _ = self.watched[ip]
+            # Fenêtre encore trop courte (cible ajoutée il y a quelques secondes) : mesure
+            if ring.count >= AGENT_WATCH_SAMPLES // 5:
+                return {'ip': ip, **window_stats(ring.recent(AGENT_WATCH_SAMPLES))}, 'window'
+        stats = StreamingStats()
+        _, cadence = await paced_probes(self.engine, ip, AGENT_WATCH_SAMPLES, rate, 1, stats.add, keep=False)
+        if ip not in self.watched:
+            self.watch(ip)
+        return {'ip': ip, **stats.to_dict(), 'cadence': cadence}, 'fresh'
+
+    async def handle(self, request):
+        cmd = request.get('cmd')
+        transport = request.get('transport')
+        if transport and transport != self.engine.name:
+            raise ValueError(f"l'agent mesure en {self.engine.name}, pas en {transport}")
+        if cmd == 'ranking':
+            region = request.get('region', 'eu')
+            if region not in self.regions:
+                raise ValueError(f"région non suivie par l'agent : {region}")
+            if request.get('fresh') or region not in self.scanned:
+                await self.scan(region)
+            return {'region': region, 'age': time.time() - self.scanned[region], 'pops': self.ranking(region)}
+        if cmd == 'server':
+            data, source = await self.server(request['ip'], request.get('fresh', False), request.get('rate', 128))
+            return {'data': data, 'source': source}
+        if cmd == 'status':
+            return {'transport': self.engine.name, 'regions': self.scanned, 'watched': list(self.watched)}
+        raise ValueError(f"commande inconnue : {cmd}")
+
+    async def on_client(self, reader, writer):
+        try:
+            line = await reader.readline()
+            try:
+                response = {'ok': True, **await self.handle(json.loads(line))}
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def run(self, path=AGENT_SOCKET):
+        async with transport_scope() as engine:
+            self.engine = engine
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            if os.path.exists(path):
+                os.unlink(path)  # Socket d'un agent précédent arrêté brutalement
+            server = await asyncio.start_unix_server(self.on_client, path)
+            os.chmod(path, 0o600)
+            try:
+                import signal
+                # Arrêt propre (socket supprimée) sur SIGTERM, comme sur Ctrl+C
+                asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+            except (ImportError, AttributeError, NotImplementedError):
+                pass
+            try:
+                while True:
+                    for region in self.regions:
+                        await self.scan(region)
+                    await asyncio.sleep(self.scan_interval)
+            finally:
+                server.close()
+                for _, task in self.watched.values():
+                    task.cancel()
+                if os.path.exists(path):
+                    os.unlink(path)
+
+def agent_request(request, path=AGENT_SOCKET, timeout=60):
+    """Requête à l'agent résident (transport courant joint), None s'il ne
+    tourne pas ou ne peut pas répondre : l'appelant mesure alors lui-même"""
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(json.dumps({**request, 'transport': DEFAULT_TRANSPORT}).encode() + b'\n')
+            with sock.makefile('rb') as f:
+                line = f.readline()
+        response = json.loads(line)
+    except (ConnectionRefusedError, FileNotFoundError):
+        return None
+    except (OSError, ValueError) as e:
+        # Agent bloqué (timeout), arrêté en pleine réponse ou réponse illisible
+        print(color(f"⚠️  Agent sans réponse exploitable ({e or type(e).__name__}), mesure locale", 'yellow'))
+        return None
+    if not response.get('ok'):
+        print(color(f"⚠️  Agent : {response.get('error')}, mesure locale", 'yellow'))
+        return None
+    return response
+
+def run_agent(path=AGENT_SOCKET, config_file=None):
+    """Mode --agent : tourne jusqu'à Ctrl+C"""
+    if not hasattr(asyncio, 'start_unix_server'):
+        print(color("❌ Agent indisponible : sockets Unix non supportées sur cette plateforme", 'red'))
+        return
+    print(f"🛰️  Agent lagtest sur {path} (transport {DEFAULT_TRANSPORT}, rescan toutes les "
+          f"{AGENT_SCAN_INTERVAL}s, Ctrl+C pour arrêter)")
+    try:
+        run_async(ProbeAgent(config_file=config_file).run(path))
+    except asyncio.CancelledError:
+        print(color("\nAgent arrêté", 'yellow'))
+
+def agent_ranking(region, fresh=False, path=AGENT_SOCKET):
+    """--eu/--us via l'agent ; False si aucun agent ne répond"""
+    response = agent_request({'cmd': 'ranking', 'region': region, 'fresh': fresh}, path)
+    if response is None:
+        return False
+    region_name = {'eu': "EUROPE", 'us': "US"}.get(region, "MONDE")
+    print(f"\n🌍 SERVEURS {region_name} (agent, mesure d'il y a {response['age']:.0f}s)")
+    print("=" * 55)
+    results = []
+    for entry in response['pops']:
+        print_pop(entry['server'], entry['pop'], entry['responding'], entry['total'])
+        if entry['pop']:
+            results.append((entry['id'], entry['server'], entry['pop']))
+    print_ranking(results, region)
+    return True
+
+def agent_detailed_test(server_ip, rate=128, fresh=False, path=AGENT_SOCKET):
+    """-s via l'agent ; False si aucun agent ne répond"""
+    response = agent_request({'cmd': 'server', 'ip': server_ip, 'rate': rate, 'fresh': fresh}, path)
+    if response is None:
+        return False
+    data = response['data']
+    if response['source'] == 'window':
+        source = f"fenêtre glissante, {data['sent']} probes @ {MONITOR_RATE} Hz"
+    else:
+        source = f"mesure fraîche @ {rate} Hz"
+    print(f"\n Test du serveur → {server_ip} (agent, {source})")
+    print("=" * 50)
+    if data['samples']:
+        analyze_results(data)
+    else:
+        print(color("SERVEUR INACCESSIBLE", 'red'))
+    return True
+
+# Benchmark hors réseau (transport simulé) : métrique -> (sens, seuil de bruit)
+# sens +1 = plus haut est mieux ; un écart sous le seuil absolu n'est pas
+# une régression (timings sub-ms)
+BENCH_METRICS = {
+    'scan_cpu_us': (-1, 5),
+    'scan_probes_per_s': (+1, 500),
+    'sched_drift_avg_ms': (-1, 0.5),
+    'sched_drift_max_ms': (-1, 5),
+    'stats_add_us': (-1, 1),
+    'window_add_us': (-1, 5),
+    'profile_record_us': (-1, 0.5),
+    'profile_drift_avg_ms': (-1, 0.5),
+    'profile_drift_max_ms': (-1, 5),
+    'race_packets': (-1, 0),
+    'batch_run_us': (-1, 50),
+    'path_wall_s': (-1, 0.5),
+    'geo_packets': (-1, 100),
+    'geo_wall_s': (-1, 0.5),
+    'geo_stall_ms': (-1, 10),
+    'jitter_kernel_ms': (-1, 0.5),
+    'jitter_user_ms': (-1, 0.5),
+    'udp_calls_per_probe': (-1, 0.2),
+}
+BENCH_TOLERANCE = 0.25
+
+def bench_network(pops=22, relays=3, seed=0):
+    """Réseau simulé type scan EU : {pop: [relais]} et profils associés"""
+    import random
+    rng = random.Random(seed)
+    candidates, profiles = {}, {}
+    for i in range(pops):
+        base = rng.uniform(8, 80)
+        candidates[f"pop{i}"] = []
+        for j in range(relays):
+            ip = f"10.{i}.{j}.1"
+            candidates[f"pop{i}"].append(ip)
+            profiles[ip] = {'base': base + rng.uniform(0, 3), 'jitter': rng.uniform(0.5, 4)}
+    return candidates, profiles
+
+async def bench_probes():
+    global PROFILE
+    candidates, profiles = bench_network()
+    relays = [ip for ips in candidates.values() for ip in ips]
+    metrics = {}
+
+    async with SimulatedTransport(dict(profiles)) as engine:
+        # Sans espacement ni attente : seul le coût CPU par probe est mesuré
+        start = time.process_time()
+        await scan_targets(relays, count=20, interval=0, engine=engine)
+        cpu = time.process_time() - start
+        metrics['scan_cpu_us'] = cpu / (20 * len(relays)) * 1e6
+        metrics['scan_probes_per_s'] = 20 * len(relays) / cpu
+
+        _, cadence = await paced_test(relays[0], 500, rate=128, engine=engine)
+        metrics['sched_drift_avg_ms'] = cadence['drift_avg']
+        metrics['sched_drift_max_ms'] = cadence['drift_max']
+
+        # Même série sous --self-profile : fil sentinelle, hook GC et enregistrements
+        previous, PROFILE = PROFILE, SelfProfile()
+        PROFILE.start()
+        try:
+            _, cadence = await paced_test(relays[0], 500, rate=128, engine=engine)
+        finally:
+            PROFILE.stop()
+            PROFILE = previous
+        metrics['profile_drift_avg_ms'] = cadence['drift_avg']
+        metrics['profile_drift_max_ms'] = cadence['drift_max']
+
+    # Course déterministe à graine fixe : moyenne de 3 réseaux tirés
+    packets = []
+    for seed in range(3):
+        async with SimulatedTransport(dict(profiles), seed) as engine:
+            packets.append((await race_scan(candidates, engine=engine))[2])
+    metrics['race_packets'] = statistics.mean(packets)
+    return metrics
+
+# Chemin simulé : perte ICMP limitée au saut 2 (sans suite), vraie
+# dégradation (perte + latence) à partir du saut 4
+BENCH_PATH_TARGET = '10.200.0.9'
+BENCH_PATH = {
+    '10.200.0.1': {'base': 1, 'jitter': 0.2},
+    '10.200.0.2': {'base': 8, 'jitter': 0.5, 'loss': 0.5},
+    '10.200.0.3': {'base': 18, 'jitter': 0.5},
+    '10.200.0.4': {'base': 45, 'jitter': 1, 'loss': 0.3},
+    '10.200.0.5': {'base': 46, 'jitter': 1, 'loss': 0.3},
+}
+BENCH_PATH_EXPECTED = {'Perte': '10.200.0.4', 'Latence': '10.200.0.4'}
+
+async def bench_path():
+    """Durée d'une analyse de chemin et attribution correcte du saut fautif"""
+    profiles = {ip: dict(profile) for ip, profile in BENCH_PATH.items()}
+    profiles[BENCH_PATH_TARGET] = {'base': 47, 'jitter': 1, 'loss': 0.3, 'path': list(BENCH_PATH)}
+    async with SimulatedTransport(profiles) as engine:
+        start = time.perf_counter()
+        path = await trace_path(BENCH_PATH_TARGET, engine=engine)
+        elapsed = time.perf_counter() - start
+    found = {label.split()[0]: hop['ip'] for label, hop in locate_degradation(path)}
+    return elapsed, found == BENCH_PATH_EXPECTED
+
+# Scan mondial simulé : client à Paris, RTT = allongement × distance fibre + accès
+BENCH_GEO_CLIENT = (2.35, 48.86)
+
+def bench_world(pops=120, relays=3, seed=0):
+    """Réseau mondial simulé : {pop: [relais]}, coordonnées et profils"""
+    import random
+    rng = random.Random(seed)
+    candidates, geos, profiles = {}, {}, {}
+    for i in range(pops):
+        geos[f"pop{i}"] = (rng.uniform(-180, 180), rng.uniform(-45, 65))
+        base = 2 + rng.uniform(1.3, 2.2) * great_circle_km(BENCH_GEO_CLIENT, geos[f"pop{i}"]) / GEO_KM_PER_MS
+        candidates[f"pop{i}"] = [f"10.{i}.{j}.1" for j in range(relays)]
+        for ip in candidates[f"pop{i}"]:
+            profiles[ip] = {'base': base + rng.uniform(0, 3), 'jitter': rng.uniform(0.5, 4)}
+    return candidates, geos, profiles
+
+async def bench_geo():
+    """Scan mondial élagué vs complet : paquets, durées, plus long blocage de la
+    boucle pendant que des probes sont en vol et sûreté (meilleur POP sondé)"""
+    candidates, geos, profiles = bench_world()
+    start = time.perf_counter()
+    async with SimulatedTransport(dict(profiles)) as engine:
+        results = await scan_targets([ip for ips in candidates.values() for ip in ips], count=10, engine=engine)
+    full_wall = time.perf_counter() - start
+    best = min(candidates, key=lambda pop: statistics.median(
+        statistics.mean(t for t in results[ip] if t is not None) for ip in candidates[pop]))
+    stall = [0.0]
+    start = time.perf_counter()
+    async with SimulatedTransport(dict(profiles)) as engine:
+        async def watch():
+            while True:
+                before = time.perf_counter()
+                await asyncio.sleep(0.001)
+                if engine.pending:
+                    stall[0] = max(stall[0], (time.perf_counter() - before - 0.001) * 1000)
+        watcher = asyncio.ensure_future(watch())
+        try:
+            pruned, _ = await geo_scan(candidates, geos, engine=engine)
+        finally:
+            watcher.cancel()
+    return engine.sent, time.perf_counter() - start, stall[0], full_wall, best not in pruned
+
+def bench_clocks(samples=500, rate=128, threads=2):
+    """Jitter ICMP loopback sous contention du GIL, horloge noyau puis espace
+    utilisateur : {horloge: (jitter ms, horloges des RTT)}, None sans ICMP"""
+    stop = threading.Event()
+
+    def load():
+        while not stop.is_set():
+            sum(range(1000))
+
+    async def series(kernel_clock):
+        engine = IcmpEngine(kernel_clock)
+        try:
+            engine.open()
+        except OSError:
+            return None
+        try:
+            stats = StreamingStats()
+            _, cadence = await paced_probes(engine, '127.0.0.1', samples, rate, 1, stats.add, keep=False)
+            return stats.to_dict()['jitter'], cadence['clocks']
+        finally:
+            engine.close()
+
+    workers = [threading.Thread(target=load, daemon=True) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    try:
+        kernel = run_async(series(True))
+        user = run_async(series(False)) if kernel else None
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+    return {'kernel': kernel, 'user': user} if kernel and user else None
+
+async def bench_udp(samples=500, rate=128):
+    """Appels système par probe UDP en série cadencée contre l'écho local"""
+    echo, port = await open_udp_echo(0, '127.0.0.1')
+    try:
+        async with UdpTransport(port) as engine:
+            await paced_probes(engine, '127.0.0.1', samples, rate, 1, keep=False)
+            return engine.syscalls / samples
+    finally:
+        echo.close()
+
+def bench_stats(samples=100000):
+    import random
+    rng = random.Random(0)
+    values = [20 + rng.lognormvariate(0, 0.5) for _ in range(samples)]
+    stats = StreamingStats()
+    start = time.perf_counter()
+    for rtt in values:
+        stats.add(rtt)
+    stats.to_dict()
+    return (time.perf_counter() - start) / samples * 1e6
+
+def bench_windows(samples=100000, rate=128):
+    """Coût par échantillon des fenêtres glissantes (toutes durées)"""
+    import random
+    rng = random.Random(0)
+    values = [None if rng.random() < 0.01 else 20 + rng.lognormvariate(0, 0.5) for _ in range(samples)]
+    windows = [SlidingWindow(span) for span in WINDOW_SPANS]
+    start = time.perf_counter()
+    for i, rtt in enumerate(values):
+        for window in windows:
+            window.add(i / rate, rtt)
+    return (time.perf_counter() - start) / samples * 1e6
+
+def bench_self_profile(probes=100000):
+    """Coût des seuls enregistrements de --self-profile par probe (ordonnanceur,
+    envoi, réveil) ; l'effet du fil sentinelle est mesuré sur la cadence"""
+    profile = SelfProfile()
+    start = time.perf_counter()
+    for _ in range(probes):
+        now = time.perf_counter()
+        profile.record_sched(now)
+        profile.record_send(now)
+        profile.record_wake(now, 0.0)
+    return (time.perf_counter() - start) / probes * 1e6
+
+def bench_runs(runs=500, samples=500, seed=0):
+    """Runs stockés simulés : pertes, pics et longueurs variables"""
+    import random
+    rng = random.Random(seed)
+    result = []
+    for i in range(runs):
+        base = rng.uniform(8, 80)
+        run = array('d')
+        for _ in range(samples - rng.randrange(samples // 10)):
+            u = rng.random()
+            run.append(math.nan if u < 0.01 else base + rng.uniform(30, 100) if u < 0.02
+                       else base + rng.lognormvariate(0, 0.5))
+        result.append(run)
+    return result
+
+def batch_parity(expected, actual):
+    """Écarts entre deux résultats de batch_stats (backend python vs numpy).
+
+    Les percentiles du backend python viennent du sketch : tolérance alpha.
+    """
+    mismatches = []
+    for i, (a, b) in enumerate(zip(expected, actual)):
+        for key, value in a.items():
+            if key in ('p95', 'p99'):
+                ok = abs(value - b[key]) <= 0.01 * abs(b[key]) + 1e-9
+            elif key in ('avg', 'jitter'):
+                ok = math.isclose(value, b[key], rel_tol=1e-9, abs_tol=1e-9)
+            else:
+                ok = value == b[key]
+            if not ok:
+                mismatches.append(f"run {i} {key}: {value} != {b[key]}")
+    return mismatches
+
+def bench_batch():
+    """Réanalyse en lot : temps par run (NumPy) et parité avec le chemin Python"""
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return None, []
+    runs = bench_runs()
+    start = time.perf_counter()
+    actual = batch_stats(runs, 'numpy')
+    elapsed = time.perf_counter() - start
+    return elapsed / len(runs) * 1e6, batch_parity(batch_stats(runs, 'python'), actual)
+
+def run_benchmark(out_path=None, baseline_path=None):
+    """Benchmark sans réseau ; code de sortie 1 si régression vs la référence"""
+    print("\n⏱️  BENCHMARK (transport simulé)")
+    print("=" * 50)
+    metrics = run_async(bench_probes())
+    metrics['stats_add_us'] = bench_stats()
+    metrics['window_add_us'] = bench_windows()
+    metrics['profile_record_us'] = bench_self_profile()
+    metrics['path_wall_s'], path_ok = run_async(bench_path())
+    metrics['geo_packets'], metrics['geo_wall_s'], metrics['geo_stall_ms'], full_wall, geo_ok = \
+        run_async(bench_geo())
+    batch_us, mismatches = bench_batch()
+    if batch_us is not None:
+        metrics['batch_run_us'] = batch_us
+    clocks = bench_clocks()
+    if clocks:
+        metrics['jitter_kernel_ms'] = clocks['kernel'][0]
+        metrics['jitter_user_ms'] = clocks['user'][0]
+    metrics['udp_calls_per_probe'] = run_async(bench_udp())
+
+    baseline = None
+    if baseline_path:
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    regressions = []
+    for key, (direction, noise) in BENCH_METRICS.items():
+        if key not in metrics:
+            continue
+        line = f"{key:<20} {metrics[key]:10.3f}"
+        if baseline and key in baseline and baseline[key]:
+            delta = metrics[key] - baseline[key]
+            change = delta / baseline[key]
+            line += f"   réf {baseline[key]:10.3f} ({change:+.0%})"
+            if -change * direction > BENCH_TOLERANCE and abs(delta) > noise:
+                regressions.append(key)
+                line = color(line + "  RÉGRESSION", 'red')
+        print(line)
+
+    if batch_us is None:
+        print("\nParité NumPy  : NumPy absent, non vérifiée")
+    elif mismatches:
+        print("\n" + color(f"Parité NumPy  : {len(mismatches)} écart(s)", 'red'))
+        for mismatch in mismatches[:5]:
+            print(f"   • {mismatch}")
+        regressions.append('batch_parity')
+    else:
+        print("\n" + color("Parité NumPy  : OK", 'green'))
+    if path_ok:
+        print(color("Chemin simulé : saut fautif localisé", 'green'))
+    else:
+        print(color("Chemin simulé : mauvais saut fautif", 'red'))
+        regressions.append('path_attribution')
+    extra = metrics['profile_drift_avg_ms'] - metrics['sched_drift_avg_ms']
+    line = (f"Self-profile  : dérive moy {metrics['profile_drift_avg_ms']:.2f}ms "
+            f"(sans {metrics['sched_drift_avg_ms']:.2f}ms, {extra:+.2f}ms)")
+    if extra <= SELF_PROFILE_LIMITS['sched']:
+        print(color(line, 'green'))
+    else:
+        print(color(line + ", plus que le seuil d'ordonnancement", 'red'))
+        regressions.append('self_profile_drift')
+    if not clocks:
+        print("Horloge noyau : ICMP indisponible, non mesurée")
+    else:
+        line = (f"Horloge noyau : jitter loopback {clocks['kernel'][0]:.3f}ms "
+                f"(espace utilisateur {clocks['user'][0]:.3f}ms) sous charge GIL")
+        if not all(clock.startswith('kernel') for clock in clocks['kernel'][1]):
+            # Pas d'horodatage noyau sur cet OS : les deux séries sont en espace utilisateur
+            print(line + ", horodatage noyau absent")
+        elif clocks['kernel'][0] < clocks['user'][0]:
+            print(color(line, 'green'))
+        else:
+            print(color(line + ", pas de gain", 'red'))
+            regressions.append('kernel_clock')
+    if geo_ok:
+        print(color("Élagage géo   : meilleur POP conservé", 'green'))
+    else:
+        print(color("Élagage géo   : meilleur POP élagué à tort", 'red'))
+        regressions.append('geo_pruning')
+    if metrics['geo_wall_s'] < full_wall:
+        print(color(f"Durée géo     : {metrics['geo_wall_s']:.2f}s (scan complet {full_wall:.2f}s)", 'green'))
+    else:
+        print(color(f"Durée géo     : {metrics['geo_wall_s']:.2f}s, pas plus rapide que le scan complet "
+                    f"({full_wall:.2f}s)", 'red'))
+        regressions.append('geo_wall')
+
+    if out_path:
+        with open(out_path, 'w', encoding='utf-8') as f:
+            json.dump(metrics, f, indent=2)
+        print(f"\n💾 Résultats enregistrés dans {out_path}")
+    if regressions:
+        print(color(f"\n❌ {len(regressions)} régression(s) > {BENCH_TOLERANCE:.0%}", 'red'))
+        sys.exit(1)
+
+def main():
+    global DEFAULT_TRANSPORT, UDP_DEFAULT_PORT, EVENTS, PROFILE
+    parser = argparse.ArgumentParser(
+        description="Test de ping optimisé pour CS2",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemples d'utilisation:
+  python script.py              # Menu principal
+  python script.py --eu       # Liste des serveurs EU
+  python script.py --us       # Liste des serveurs US
+  python script.py --world     # POPs du monde (les trop lointains sont élagués)
+  python script.py --world --full  # Tous les POPs du monde, sans élagage
+  python script.py --path 1.2.3.4  # Où la latence/perte apparaît-elle ?
+  python script.py --eu --refresh-config  # Sans cache de config SDR
+  python script.py --eu --adaptive  # Scan adaptatif (moins de paquets)
+  python script.py --eu --full  # Scan complet (sinon : rescan incrémental)
+  python script.py -s 1.2.3.4   # Tester un serveur spécifique
+  python script.py -s 1.2.3.4 --rate 64  # Test à 64 Hz
+  python script.py -s 1.2.3.4 5.6.7.8 --pps 256  # Plusieurs serveurs en parallèle
+  python script.py -s top3      # Test détaillé des 3 meilleurs POPs EU
+  python script.py --monitor 1.2.3.4 5.6.7.8  # Surveillance continue
+  python script.py -s 1.2.3.4 --log avant.bin  # Enregistrer les échantillons
+  python script.py --compare avant.bin apres.bin  # Comparer deux runs
+  python script.py --eu --transport sim  # Scan sur réseau simulé
+  python script.py -s 1.2.3.4 --transport udp  # Probes UDP (sans droits admin)
+  python script.py --bench out.json --bench-baseline ref.json  # Benchmark CI
+  python script.py --agent &   # Agent résident : --eu/-s répondent aussitôt
+  python script.py --eu --fresh  # Via l'agent, mais mesure neuve
+  python script.py -s 1.2.3.4 --ndjson > events.ndjson  # Flux pour collecteur
+  python script.py -s 1.2.3.4 --self-profile  # La machine est-elle apte à mesurer ?
+  python script.py -h           # Guide réseau
+        """
+    )
+    
+    parser.add_argument("-s", "--server", nargs='+', metavar="CIBLE",
+                        help="Serveur(s) à tester : IP, fichier d'IP ou topK (meilleurs relais du scan)")
+    parser.add_argument("--pps", type=int, default=PPS_BUDGET,
+                        help="Budget global en paquets/s des tests multi-cibles")
+    parser.add_argument("--eu", action="store_true", help="Lister les serveurs EU")
+    parser.add_argument("--us", action="store_true", help="Lister les serveurs US")
+    parser.add_argument("--world", action="store_true",
+                        help="Scanner les POPs SDR du monde (élagage géographique ; --full : tous, multi-processus)")
+    parser.add_argument("--workers", type=int,
+                        help="Nombre de processus du scan mondial (défaut: nombre de cœurs)")
+    parser.add_argument("--path", metavar="IP",
+                        help="Analyse du chemin saut par saut (façon mtr)")
+    parser.add_argument("--agent", action="store_true",
+                        help="Lancer l'agent résident (--eu, --us et -s lui délèguent la mesure)")
+    parser.add_argument("--agent-socket", default=AGENT_SOCKET, metavar="CHEMIN",
+                        help="Socket Unix de l'agent résident")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Avec l'agent : forcer une nouvelle mesure au lieu des estimations glissantes")
+    parser.add_argument("--no-agent", action="store_true",
+                        help="Mesurer localement même si un agent tourne")
+    parser.add_argument("--full", action="store_true",
+                        help="Scan complet (10 probes par relais, tous les POPs) sans s'appuyer sur les scans précédents")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Scan adaptatif : abandonne tôt les serveurs clairement battus")
+    parser.add_argument("--rate", type=int,
+                        help="Cadence des probes en Hz (défaut: 128 test détaillé, 20 monitoring)")
+    parser.add_argument("--monitor", nargs='+', metavar="IP",
+                        help="Surveiller une ou plusieurs IP en continu")
+    parser.add_argument("--interval", type=float, default=MONITOR_INTERVAL,
+                        help="Période des résumés du monitoring en secondes")
+    parser.add_argument("--log", metavar="FICHIER",
+                        help="Enregistrer les échantillons dans un journal binaire (-s, --monitor)")
+    parser.add_argument("--replay", nargs='+', metavar="FICHIER",
+                        help="Réanalyser des journaux enregistrés")
+    parser.add_argument("--compare", nargs=2, metavar=("AVANT", "APRÈS"),
+                        help="Comparer deux journaux enregistrés")
+    parser.add_argument("--transport", choices=sorted(TRANSPORTS), default=DEFAULT_TRANSPORT,
+                        help="Transport des probes (sim = réseau simulé, sans paquets)")
+    parser.add_argument("--udp-port", type=int, default=UDP_DEFAULT_PORT,
+                        help="Port UDP des cibles hors config SDR (--transport udp)")
+    parser.add_argument("--udp-echo", type=int, metavar="PORT",
+                        help="Lancer un écho UDP local (cible de test pour --transport udp)")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Événements NDJSON sur stdout (échantillons, résumés), texte sur stderr")
+    parser.add_argument("--self-profile", action="store_true",
+                        help="Mesurer le bruit ajouté par la machine et lagtest (tests détaillés -s)")
+    parser.add_argument("--bench", nargs='?', const='', metavar="SORTIE",
+                        help="Benchmark hors réseau (résultats JSON optionnels)")
+    parser.add_argument("--bench-baseline", metavar="FICHIER",
+                        help="Échouer si le benchmark régresse par rapport à ce fichier")
+    parser.add_argument("--duration", type=float,
+                        help="Durée du monitoring en secondes (défaut: jusqu'à Ctrl+C)")
+    parser.add_argument("--sdr-config", metavar="FICHIER",
+                        help="Utiliser une réponse GetSDRConfig enregistrée (hors-ligne)")
+    parser.add_argument("--refresh-config", action="store_true",
+                        help="Ignorer le cache et retélécharger la config SDR")
+    
+    # Override help pour afficher notre guide
+    if len(sys.argv) > 1 and sys.argv[1] in ['-h', '--help']:
+        show_help()
+        return
+    
+    args = parser.parse_args()
+    
+    DEFAULT_TRANSPORT = args.transport
+    UDP_DEFAULT_PORT = args.udp_port
+    if args.self_profile:
+        PROFILE = SelfProfile()
+    if args.ndjson:
+        # stdout reste réservé au flux ; l'affichage habituel passe sur stderr
+        EVENTS = NdjsonWriter(sys.stdout)
+        sys.stdout = sys.stderr
+    try:
+        dispatch(args)
+    finally:
+        if EVENTS:
+            EVENTS.close()
+
+def dispatch(args):
+    """Exécute le mode demandé en ligne de commande"""
+    # Scan adaptatif, journal, flux NDJSON, auto-diagnostic ou config imposée : mesure locale
+    use_agent = not (args.no_agent or args.adaptive or args.full or args.log or args.ndjson
+                     or args.self_profile or args.sdr_config or args.refresh_config)
+    
+    # Récupération des serveurs CS2
+    if args.agent:
+        run_agent(args.agent_socket, args.sdr_config)
+    elif (args.eu or args.us) and not args.server:
+        region = 'eu' if args.eu else 'us'
+        # Réponse immédiate de l'agent résident s'il tourne
+        if not (use_agent and agent_ranking(region, args.fresh, args.agent_socket)):
+            servers = fetch_cs2_servers(region, args.sdr_config, args.refresh_config)
+            list_all_servers(servers, region, args.adaptive, incremental=not args.full)
+    elif args.world:
+        servers = fetch_cs2_servers('world', args.sdr_config, args.refresh_config)
+        # Élagage géographique sauf scan complet imposé
+        list_all_servers(servers, 'world', args.adaptive, args.workers, not args.full, geo=not args.full)
+    elif args.udp_echo:
+        print(f"🔁 Écho UDP sur le port {args.udp_echo} (Ctrl+C pour arrêter)")
+        run_async(udp_echo_server(args.udp_echo))
+    elif args.bench is not None:
+        run_benchmark(args.bench or None, args.bench_baseline)
+    elif args.replay:
+        replay_logs(args.replay)
+    elif args.compare:
+        compare_logs(*args.compare)
+    elif args.path:
+        run_path_analysis(args.path)
+    elif args.monitor:
+        run_monitor([(f"Serveur {i}", ip) for i, ip in enumerate(args.monitor, 1)],
+                    args.rate or MONITOR_RATE, args.interval, args.duration, args.log)
+    elif args.server:
+        rate = args.rate or 128
+        targets = parse_targets(args.server, 'us' if args.us else 'eu', args.sdr_config)
+        if len(targets) > 1:
+            if args.pps < rate:
+                print(color(f"❌ --pps {args.pps} inférieur à la cadence ({rate} Hz) : chaque cible "
+                            f"serait ralentie sous sa cadence", 'red'))
+                return
+            run_multi_test(targets, rate, args.pps, args.log)
+        elif targets and not (use_agent and agent_detailed_test(targets[0][1], rate, args.fresh, args.agent_socket)):
+            name, ip = targets[0]
+            run_detailed_test("Serveur personnalisé" if name == ip else name, ip, rate, args.log)
+    else:
+        show_main_menu()
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print(color("\nTest interrompu", 'red'))
+    except Exception as e:
+        print(f"❌ ERREUR: {e}")
+        print("Vérifiez: connexion internet, requests installé, droits admin/root pour l'ICMP")
+        print("Installation: pip install requests")
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# lagtest.py est un script à la racine du dépôt, pas un paquet installé
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
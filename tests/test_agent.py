@@ -0,0 +1,53 @@
+import asyncio
+import os
+import socket
+
+import pytest
+
+import lagtest
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'sdr_config.json')
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="sockets Unix indisponibles")
+
+
+def test_agent_round_trip_and_shutdown(tmp_path, monkeypatch):
+    monkeypatch.setattr(lagtest, 'DEFAULT_TRANSPORT', 'sim')
+    path = str(tmp_path / 'agent.sock')
+
+    async def scenario():
+        agent = lagtest.ProbeAgent(regions=('eu',), config_file=FIXTURE)
+        task = asyncio.ensure_future(agent.run(path))
+        while not os.path.exists(path):
+            await asyncio.sleep(0.01)
+        loop = asyncio.get_running_loop()
+
+        def ask(request):
+            return loop.run_in_executor(None, lagtest.agent_request, request, path, 30)
+
+        status = await ask({'cmd': 'status'})
+        ranking = await ask({'cmd': 'ranking', 'region': 'eu'})
+        server = await ask({'cmd': 'server', 'ip': '10.0.0.1', 'rate': 500})
+        unknown = await ask({'cmd': 'reboot'})
+        # Transport différent côté client : l'agent refuse, le client mesure lui-même
+        monkeypatch.setattr(lagtest, 'DEFAULT_TRANSPORT', 'udp')
+        mismatch = await ask({'cmd': 'status'})
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return agent, status, ranking, server, unknown, mismatch
+
+    agent, status, ranking, server, unknown, mismatch = lagtest.run_async(scenario())
+    assert status['ok'] and status['transport'] == 'sim'
+    assert ranking['region'] == 'eu'
+    assert {pop['server']['code'] for pop in ranking['pops']} >= {'AMS', 'FRA', 'PAR'}
+    assert all(pop['responding'] == pop['total'] for pop in ranking['pops'])
+    assert server['source'] == 'fresh'
+    assert server['data']['sent'] == lagtest.AGENT_WATCH_SAMPLES and server['data']['samples']
+    assert '10.0.0.1' in agent.watched
+    assert unknown is None and mismatch is None
+    # Arrêt : socket supprimée, cibles suivies stoppées
+    assert not os.path.exists(path)
+    assert all(task.done() for _, task in agent.watched.values())
+    assert lagtest.agent_request({'cmd': 'status'}, path) is None
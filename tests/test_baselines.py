@@ -0,0 +1,37 @@
+import lagtest
+
+
+def stored(ewma, now):
+    return {'ewma': ewma, 'var': 0.3, 'samples': 200, 'seen': now - 600}
+
+
+def test_stable_samples_fold_into_ewma():
+    now = 1e9
+    store = {'ip': stored(10, now)}
+    entry, shifted = lagtest.update_baseline(store, 'ip', [10.2, 9.8, 10.1], now)
+    assert not shifted
+    assert entry['samples'] == 203
+    assert abs(entry['ewma'] - 10) < 0.1
+
+
+def test_route_change_resets_baseline_to_fresh_mean():
+    now = 1e9
+    store = {'ip': stored(10, now)}
+    entry, shifted = lagtest.update_baseline(store, 'ip', [80, 81, None], now)
+    assert shifted
+    assert entry['ewma'] == 80.5
+    assert entry['samples'] == 2
+    # La référence neuve n'est plus sûre : le relais redevient prétendant
+    assert lagtest.baseline_uncertainty(entry, now) > lagtest.baseline_uncertainty(stored(10, now), now)
+
+
+def test_single_check_probe_detects_large_improvement():
+    now = 1e9
+    store = {'ip': stored(60, now)}
+    entry, shifted = lagtest.update_baseline(store, 'ip', [12], now)
+    assert shifted and entry['ewma'] == 12
+
+
+def test_all_lost_keeps_baseline():
+    store = {}
+    assert lagtest.update_baseline(store, 'ip', [None, None]) == (None, False)
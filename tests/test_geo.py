@@ -0,0 +1,63 @@
+import os
+import statistics
+
+import pytest
+
+import lagtest
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'sdr_config.json')
+
+
+def world(client, mute=()):
+    """POPs de la config enregistrée, RTT simulés selon la distance au client"""
+    servers = lagtest.fetch_cs2_servers('world', FIXTURE)
+    pop_relays = {sid: server['relays'] for sid, server in servers.items()}
+    geos = {sid: server['geo'] for sid, server in servers.items()}
+    profiles = {}
+    for sid, relays in pop_relays.items():
+        base = 3 + 1.7 * lagtest.great_circle_km(client, geos[sid]) / lagtest.GEO_KM_PER_MS
+        for j, ip in enumerate(relays):
+            profiles[ip] = None if sid in mute else {'base': base + j, 'jitter': 1.0}
+    return pop_relays, geos, profiles
+
+
+def scan(pop_relays, geos, profiles):
+    async def run():
+        async with lagtest.SimulatedTransport(dict(profiles)) as engine:
+            full = await lagtest.scan_targets([ip for ips in pop_relays.values() for ip in ips],
+                                              engine=engine)
+        async with lagtest.SimulatedTransport(dict(profiles)) as engine:
+            pruned, location = await lagtest.geo_scan(pop_relays, geos, engine=engine)
+            return full, pruned, location, engine.sent
+    return lagtest.run_async(run())
+
+
+def best_pop(pop_relays, results):
+    def score(sid):
+        means = [statistics.mean(t for t in results[ip] if t is not None)
+                 for ip in pop_relays[sid] if any(t is not None for t in results[ip])]
+        return statistics.median(means) if means else float('inf')
+    return min(pop_relays, key=score)
+
+
+def test_fixture_skips_pops_without_relays():
+    pop_relays, _, _ = world((2.35, 48.86))
+    assert 'world-shb' not in pop_relays
+    assert len(pop_relays) == 29
+
+
+@pytest.mark.parametrize('client', [(2.35, 48.86), (-73.94, 40.67), (151.21, -33.87)])
+def test_geo_scan_keeps_the_best_pop(client):
+    pop_relays, geos, profiles = world(client)
+    full, pruned, location, sent = scan(pop_relays, geos, profiles)
+    assert best_pop(pop_relays, full) not in pruned
+    assert len(pruned) >= len(pop_relays) // 3
+    assert sent < sum(len(ips) for ips in pop_relays.values()) * 10
+    assert lagtest.great_circle_km(client, location) < 2000
+
+
+def test_geo_scan_survives_unreachable_pops():
+    client = (2.35, 48.86)
+    pop_relays, geos, profiles = world(client, mute={'world-ams', 'world-fra', 'world-tyo'})
+    full, pruned, _, _ = scan(pop_relays, geos, profiles)
+    assert best_pop(pop_relays, full) not in pruned
@@ -0,0 +1,28 @@
+import pytest
+
+import lagtest
+
+
+def icmp_engine():
+    """Transport ICMP ouvert, ou test sauté sans socket ICMP autorisée"""
+    engine = lagtest.IcmpEngine()
+    try:
+        engine.open()
+    except OSError as e:
+        engine.close()
+        pytest.skip(f"sockets ICMP non autorisées : {e}")
+    return engine
+
+
+def test_icmp_loopback_matches_every_sample():
+    async def run():
+        engine = icmp_engine()
+        try:
+            return await lagtest.paced_probes(engine, '127.0.0.1', 200, rate=128, timeout=1)
+        finally:
+            engine.close()
+    rtts, cadence = lagtest.run_async(run())
+    assert len(rtts) == 200
+    assert all(rtt is not None for rtt in rtts)
+    assert sum(cadence['clocks'].values()) == 200
+    assert all(clock.startswith('kernel') for clock in cadence['clocks'])
@@ -0,0 +1,35 @@
+import pytest
+
+import lagtest
+
+TARGETS = ['10.0.0.1', '10.0.0.2', '10.0.0.3']
+PROFILES = {ip: {'base': 10 + 7 * i, 'jitter': 1 + i, 'loss': 0.02} for i, ip in enumerate(TARGETS)}
+
+
+def solo(ip):
+    async def run():
+        async with lagtest.SimulatedTransport(dict(PROFILES)) as engine:
+            return await lagtest.detailed_run(ip, 128, 128, engine=engine)
+    return lagtest.run_async(run())
+
+
+def test_multi_target_stats_match_solo_runs():
+    # Budget pour 2 tests à la fois : 3 cibles en 2 vagues, chacune à sa cadence
+    async def run():
+        async with lagtest.SimulatedTransport(dict(PROFILES)) as engine:
+            return await lagtest.multi_detailed_runs(TARGETS, 128, 128, pps=256, engine=engine)
+    results, parallel, _ = lagtest.run_async(run())
+    assert parallel == 2
+    for ip in TARGETS:
+        alone, shared = solo(ip), results[ip]
+        for key in ('sent', 'samples', 'avg', 'jitter', 'min', 'max', 'p95', 'p99', 'loss', 'spikes'):
+            assert shared[key] == pytest.approx(alone[key]), (ip, key)
+        assert shared['cadence']['achieved_rate'] == pytest.approx(128, rel=0.1)
+
+
+def test_multi_target_rejects_budget_below_rate():
+    async def run():
+        async with lagtest.SimulatedTransport(dict(PROFILES)) as engine:
+            return await lagtest.multi_detailed_runs(TARGETS, 50, 128, pps=100, engine=engine)
+    with pytest.raises(ValueError):
+        lagtest.run_async(run())
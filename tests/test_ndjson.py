@@ -0,0 +1,75 @@
+import io
+import json
+import threading
+
+import lagtest
+
+
+def lines(buffer):
+    return [json.loads(line) for line in buffer.getvalue().splitlines()]
+
+
+class StalledStream(io.StringIO):
+    """Lecteur bloqué : chaque écriture attend `release`"""
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.entered.set()
+        self.release.wait()
+        return super().write(text)
+
+
+def test_one_json_object_per_line():
+    buffer = io.StringIO()
+    writer = lagtest.NdjsonWriter(buffer)
+    writer.emit({'type': 'sample', 'ts': 1.0, 'ip': '10.0.0.1', 'rtt': 12.5})
+    writer.emit({'type': 'sample', 'ts': 1.1, 'ip': '10.0.0.1', 'rtt': None})
+    writer.close()
+    assert lines(buffer) == [{'type': 'sample', 'ts': 1.0, 'ip': '10.0.0.1', 'rtt': 12.5},
+                             {'type': 'sample', 'ts': 1.1, 'ip': '10.0.0.1', 'rtt': None}]
+
+
+def test_stalled_reader_drops_and_close_returns():
+    stream = StalledStream()
+    writer = lagtest.NdjsonWriter(stream, maxsize=8)
+    writer.emit({'type': 'sample', 'i': -1})
+    stream.entered.wait(1)  # Le thread d'écriture est bloqué sur ce premier lot
+    for i in range(100):
+        writer.emit({'type': 'sample', 'i': i})
+    assert writer.dropped == 100 - 8
+    start = lagtest.time.perf_counter()
+    writer.close(timeout=0.2)
+    assert lagtest.time.perf_counter() - start < 1
+    stream.release.set()
+
+
+def test_dropped_events_are_reported():
+    buffer = io.StringIO()
+    writer = lagtest.NdjsonWriter(buffer, maxsize=4)
+    writer.dropped = 3
+    writer.close()
+    assert lines(buffer)[-1]['type'] == 'dropped'
+    assert lines(buffer)[-1]['count'] == 3
+
+
+def test_sharded_scan_streams_samples(monkeypatch):
+    buffer = io.StringIO()
+    monkeypatch.setattr(lagtest, 'DEFAULT_TRANSPORT', 'sim')
+    monkeypatch.setattr(lagtest, 'EVENTS', lagtest.NdjsonWriter(buffer))
+    ips = [f"10.9.{i}.1" for i in range(6)]
+    results = lagtest.sharded_scan(ips, count=10, workers=2)
+    end = lagtest.time.time()
+    lagtest.EVENTS.close()
+    samples = [event for event in lines(buffer) if event['type'] == 'sample']
+    assert len(samples) == 60
+    for ip in ips:
+        streamed = [event['rtt'] for event in samples if event['ip'] == ip]
+        assert sorted(streamed, key=str) == sorted(results[ip], key=str)
+    # Horodatés à la mesure, au fil du scan (10 probes espacées de 100ms)
+    stamps = sorted(event['ts'] for event in samples)
+    assert stamps[-1] - stamps[0] > 0.7
+    assert end - stamps[0] > 0.7
@@ -0,0 +1,42 @@
+import lagtest
+
+
+def trace(profiles, target):
+    async def run():
+        async with lagtest.SimulatedTransport(profiles) as engine:
+            return await lagtest.trace_path(target, engine=engine)
+    return lagtest.run_async(run())
+
+
+def bench_profiles():
+    profiles = {ip: dict(profile) for ip, profile in lagtest.BENCH_PATH.items()}
+    profiles[lagtest.BENCH_PATH_TARGET] = {'base': 47, 'jitter': 1, 'loss': 0.3,
+                                           'path': list(lagtest.BENCH_PATH)}
+    return profiles
+
+
+def test_trace_path_blames_the_first_persistent_hop():
+    # Saut 2 : limitation ICMP sans suite ; saut 4 : vraie dégradation
+    path = trace(bench_profiles(), lagtest.BENCH_PATH_TARGET)
+    assert [hop['ttl'] for hop in path] == list(range(1, len(lagtest.BENCH_PATH) + 2))
+    assert path[-1]['destination'] and path[-1]['ip'] == lagtest.BENCH_PATH_TARGET
+    found = {label.split()[0]: hop['ip'] for label, hop in lagtest.locate_degradation(path)}
+    assert found == lagtest.BENCH_PATH_EXPECTED
+
+
+def test_trace_path_blames_nobody_when_destination_is_silent():
+    # Premier saut limité en ICMP, routeurs suivants et cible muets
+    target = '10.201.0.9'
+    route = ['10.201.0.1', '10.201.0.2', '10.201.0.3']
+    profiles = {route[0]: {'base': 1, 'jitter': 0.2, 'loss': 0.5}, route[1]: None, route[2]: None,
+                target: None}
+
+    async def run():
+        async with lagtest.SimulatedTransport(profiles) as engine:
+            # Cible muette : pas de profil pour porter son chemin
+            engine.path = lambda ip: route
+            return await lagtest.trace_path(target, max_hops=5, engine=engine)
+    path = lagtest.run_async(run())
+    assert [hop['ip'] for hop in path] == route[:1]
+    assert not path[-1]['destination']
+    assert lagtest.locate_degradation(path) == []
@@ -0,0 +1,24 @@
+import lagtest
+
+
+def race(seed):
+    candidates, profiles = lagtest.bench_network(pops=8, relays=2)
+
+    async def run():
+        async with lagtest.SimulatedTransport(dict(profiles), seed) as engine:
+            return await lagtest.race_scan(candidates, engine=engine)
+    stats, exits, sent = lagtest.run_async(run())
+    means = {cid: {ip: st.mean for ip, st in relays.items()} for cid, relays in stats.items()}
+    return means, exits, sent
+
+
+def test_race_scan_is_reproducible():
+    # Même graine : mêmes envois, mêmes éliminations, mêmes moyennes
+    assert race(1) == race(1)
+
+
+def test_race_scan_keeps_the_best_pop():
+    candidates, profiles = lagtest.bench_network(pops=8, relays=2)
+    best = min(candidates, key=lambda cid: profiles[candidates[cid][0]]['base'])
+    _, exits, _ = race(0)
+    assert best not in exits
@@ -0,0 +1,130 @@
+import json
+import os
+import sys
+import types
+
+import pytest
+
+import lagtest
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'sdr_config.json')
+
+
+class FakeApi:
+    """Module `requests` de remplacement : réponse enregistrée ou panne réseau"""
+
+    def __init__(self, revision=None, down=False):
+        with open(FIXTURE, encoding='utf-8') as f:
+            self.data = json.load(f)
+        if revision is not None:
+            self.data['revision'] = revision
+        self.down = down
+        self.calls = 0
+
+    def get(self, url, timeout=None):
+        self.calls += 1
+        if self.down:
+            raise OSError("réseau injoignable")
+        response = types.SimpleNamespace(raise_for_status=lambda: None, json=lambda: self.data)
+        return response
+
+
+class InlineThread:
+    """Thread exécuté sur place : la revalidation est finie au retour"""
+
+    def __init__(self, target, args=(), daemon=None):
+        self.target, self.args = target, args
+
+    def start(self):
+        self.target(*self.args)
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    monkeypatch.setattr(lagtest, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(lagtest.threading, 'Thread', InlineThread)
+
+    def install(**kwargs):
+        fake = FakeApi(**kwargs)
+        monkeypatch.setitem(sys.modules, 'requests', fake)
+        return fake
+    return install
+
+
+def cache_age(seconds):
+    """Vieillit la copie en cache de `seconds`"""
+    entry = lagtest.load_sdr_cache()
+    entry['fetched_at'] = lagtest.time.time() - seconds
+    lagtest.save_sdr_cache(entry)
+    return entry
+
+
+def test_first_run_downloads_and_caches(api):
+    fake = api()
+    entry = lagtest.get_sdr_config()
+    assert fake.calls == 1
+    assert 'ams' in entry['pops']
+    assert lagtest.load_sdr_cache()['revision'] == entry['revision']
+
+
+def test_fresh_cache_skips_the_network(api):
+    api()
+    lagtest.get_sdr_config()
+    fake = api(down=True)
+    assert 'ams' in lagtest.get_sdr_config()['pops']
+    assert fake.calls == 0
+
+
+def test_stale_cache_is_served_then_revalidated(api):
+    api()
+    lagtest.get_sdr_config()
+    stale = cache_age(lagtest.SDR_CACHE_TTL + 60)
+    fake = api(revision=stale['revision'] + 1)
+    assert lagtest.get_sdr_config()['revision'] == stale['revision']
+    assert fake.calls == 1
+    assert lagtest.load_sdr_cache()['revision'] == stale['revision'] + 1
+
+
+def test_same_revision_extends_the_ttl(api):
+    api()
+    lagtest.get_sdr_config()
+    stale = cache_age(lagtest.SDR_CACHE_TTL + 60)
+    stale['pops'] = {'ams': stale['pops']['ams']}
+    lagtest.save_sdr_cache(stale)
+    api()
+    lagtest.get_sdr_config()
+    refreshed = lagtest.load_sdr_cache()
+    # Copie existante prolongée, sans réécrire l'annuaire
+    assert list(refreshed['pops']) == ['ams']
+    assert lagtest.time.time() - refreshed['fetched_at'] < lagtest.SDR_CACHE_TTL
+
+
+def test_expired_cache_downloads_again(api):
+    api()
+    lagtest.get_sdr_config()
+    expired = cache_age(lagtest.SDR_CACHE_MAX_STALE + 60)
+    fake = api(revision=expired['revision'] + 1)
+    assert lagtest.get_sdr_config()['revision'] == expired['revision'] + 1
+    assert fake.calls == 1
+
+
+def test_offline_falls_back_to_any_copy(api):
+    api()
+    lagtest.get_sdr_config()
+    expired = cache_age(lagtest.SDR_CACHE_MAX_STALE + 60)
+    api(down=True)
+    assert lagtest.get_sdr_config()['revision'] == expired['revision']
+
+
+def test_offline_without_cache_raises(api):
+    api(down=True)
+    with pytest.raises(OSError):
+        lagtest.get_sdr_config()
+
+
+def test_corrupt_cache_is_ignored(api):
+    with open(lagtest.sdr_cache_path(), 'w', encoding='utf-8') as f:
+        f.write('{"appid": 730, "pops"')
+    fake = api()
+    assert 'ams' in lagtest.get_sdr_config()['pops']
+    assert fake.calls == 1
@@ -0,0 +1,24 @@
+import lagtest
+
+
+def profile(clock):
+    """Session où seul le réveil dépasse son seuil (8ms par probe)"""
+    session = lagtest.SelfProfile()
+    for _ in range(100):
+        now = lagtest.time.perf_counter()
+        session.record_sched(now)
+        session.record_send(now)
+        session.record_wake(now - 0.018, 10.0, clock)
+    return session.summary()
+
+
+def test_wake_counts_for_user_stamped_rtts():
+    issues, level = lagtest.self_profile_verdict(profile('user'))
+    assert level == 2
+    assert any(issue.startswith("Réveil") for issue in issues)
+
+
+def test_wake_ignored_for_kernel_stamped_rtts():
+    summary = profile('kernel')
+    assert summary['wake_immune'] == 1.0
+    assert lagtest.self_profile_verdict(summary) == ([], 0)
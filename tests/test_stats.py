@@ -0,0 +1,88 @@
+import math
+import random
+import statistics
+
+import pytest
+
+import lagtest
+
+
+def sorted_quantile(times, p):
+    """Référence exacte : même rang que detailed_ping_test historique"""
+    ordered = sorted(times)
+    return ordered[int(p * len(ordered))]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_streaming_stats_matches_sorted_list(seed):
+    rng = random.Random(seed)
+    rtts = [None if rng.random() < 0.02 else 10 + rng.lognormvariate(0, 0.8) for _ in range(5000)]
+    times = [t for t in rtts if t is not None]
+
+    stats = lagtest.StreamingStats()
+    for rtt in rtts:
+        stats.add(rtt)
+    data = stats.to_dict()
+
+    assert data['samples'] == len(times)
+    assert data['sent'] == len(rtts)
+    assert data['loss'] == pytest.approx((len(rtts) - len(times)) / len(rtts) * 100)
+    assert data['avg'] == pytest.approx(statistics.mean(times), rel=1e-12)
+    assert data['jitter'] == pytest.approx(statistics.stdev(times), rel=1e-9)
+    assert data['min'] == min(times)
+    assert data['max'] == max(times)
+    # Le sketch garantit une erreur relative ≤ alpha (1%)
+    for key, p in (('p95', 0.95), ('p99', 0.99)):
+        assert data[key] == pytest.approx(sorted_quantile(times, p), rel=0.01)
+
+
+def test_latency_sketch_quantiles_within_alpha():
+    rng = random.Random(42)
+    values = [rng.uniform(0.05, 500) for _ in range(20000)]
+    sketch = lagtest.LatencySketch(alpha=0.01)
+    for value in values:
+        sketch.add(value)
+    for p in (0.01, 0.5, 0.9, 0.95, 0.99, 0.999):
+        assert sketch.quantile(p) == pytest.approx(sorted_quantile(values, p), rel=0.01)
+    assert min(values) <= sketch.quantile(1.0) <= max(values)
+
+
+def test_latency_sketch_empty():
+    assert lagtest.LatencySketch().quantile(0.99) == 0
+
+
+def test_streaming_stats_counts_spikes_after_warmup():
+    stats = lagtest.StreamingStats()
+    for i in range(lagtest.StreamingStats.SPIKE_WARMUP):
+        stats.add(20 + (i % 2))
+    stats.add(100)
+    assert stats.spikes == 1
+
+
+def test_batch_stats_numpy_matches_python():
+    pytest.importorskip("numpy")
+    runs = lagtest.bench_runs(runs=50, samples=300, seed=1)
+    expected = lagtest.batch_stats(runs, 'python')
+    actual = lagtest.batch_stats(runs, 'numpy')
+    assert lagtest.batch_parity(expected, actual) == []
+    # Les percentiles NumPy sont exacts
+    for run, data in zip(runs, actual):
+        times = [t for t in run if not math.isnan(t)]
+        assert data['p99'] == sorted_quantile(times, 0.99)
+
+
+def test_batch_stats_python_backend_handles_all_lost_run():
+    data, = lagtest.batch_stats([[math.nan, None]], 'python')
+    assert data['loss'] == 100
+    assert data['samples'] == 0
+
+
+def test_streaming_stats_spike_floor_on_quiet_link():
+    # Loopback : σ ≈ 0.01ms, un écart de 0.5ms n'est pas un pic
+    stats = lagtest.StreamingStats()
+    for i in range(200):
+        stats.add(0.05 + (i % 3) * 0.01)
+    stats.add(0.6)
+    assert stats.spikes == 0
+    stats.add(0.05 + lagtest.StreamingStats.SPIKE_FLOOR + 1)
+    assert stats.spikes == 1
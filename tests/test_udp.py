@@ -0,0 +1,36 @@
+import lagtest
+
+
+def echo_run(samples=300, rate=128):
+    """Série cadencée contre l'écho UDP local (--udp-echo)"""
+    async def run():
+        echo, port = await lagtest.open_udp_echo(0, '127.0.0.1')
+        try:
+            async with lagtest.UdpTransport(port) as engine:
+                stats = lagtest.StreamingStats()
+                _, cadence = await lagtest.paced_probes(engine, '127.0.0.1', samples, rate, 1,
+                                                        stats.add, keep=False)
+                return stats.to_dict(), cadence, engine.syscalls
+        finally:
+            echo.close()
+    return lagtest.run_async(run())
+
+
+def test_every_probe_is_matched():
+    stats, cadence, _ = echo_run()
+    assert stats['sent'] == stats['samples'] == 300
+    assert stats['loss'] == 0
+    assert stats['max'] < 50
+    assert sum(cadence['clocks'].values()) == 300
+
+
+def test_same_report_as_icmp():
+    stats, _, _ = echo_run(samples=20)
+    assert set(stats) == set(lagtest.StreamingStats().to_dict())
+
+
+def test_reads_are_coalesced():
+    _, cadence, syscalls = echo_run()
+    # Un envoi par tick ; lectures groupées quand le noyau horodate
+    bound = 1.6 if set(cadence['clocks']) <= {'kernel', 'kernel-rx'} else 3.5
+    assert syscalls / 300 < bound
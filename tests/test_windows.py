@@ -0,0 +1,81 @@
+import bisect
+import random
+import statistics
+
+import pytest
+
+import lagtest
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_sorted_blocks_matches_sorted_list(seed):
+    rng = random.Random(seed)
+    blocks, reference = lagtest.SortedBlocks(), []
+    for step in range(8000):
+        # Petites valeurs entières : beaucoup de doublons ; phases de croissance puis de vidage
+        if reference and rng.random() < (0.3 if step < 5000 else 0.7):
+            value = rng.choice(reference)
+            blocks.remove(value)
+            reference.remove(value)
+        else:
+            value = rng.randrange(500) / 4
+            blocks.insert(value)
+            reference.append(value)
+            reference.sort()
+        assert len(blocks) == len(reference)
+        if step % 97 == 0 and reference:
+            assert [blocks[i] for i in range(len(reference))] == reference
+        if reference:
+            rank = rng.randrange(len(reference))
+            assert blocks[rank] == reference[rank]
+    assert max(len(block) for block in blocks.blocks) <= 2 * blocks.LOAD
+
+
+def test_sorted_blocks_rejects_missing_values():
+    blocks = lagtest.SortedBlocks()
+    blocks.insert(1.0)
+    with pytest.raises(KeyError):
+        blocks.remove(2.0)
+    with pytest.raises(IndexError):
+        blocks[1]
+
+
+def brute_force(samples, span):
+    """Stats de la fenêtre recalculées depuis la liste complète"""
+    now = samples[-1][0]
+    start = bisect.bisect_right([t for t, _ in samples], now - span)
+    inside = [rtt for _, rtt in samples[start:]]
+    times = sorted(rtt for rtt in inside if rtt is not None)
+    n = len(times)
+    return {
+        'jitter': statistics.stdev(times) if n > 1 else 0,
+        'p95': times[min(int(0.95 * n), n - 1)],
+        'p99': times[min(int(0.99 * n), n - 1)],
+        'max': times[-1],
+        'loss': (len(inside) - n) / len(inside) * 100,
+    }
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("span", lagtest.WINDOW_SPANS[:2])
+def test_sliding_window_matches_brute_force(seed, span):
+    rng = random.Random(seed)
+    window = lagtest.SlidingWindow(span)
+    samples, worst, t = [], None, 0.0
+    for _ in range(2000):
+        t += rng.choice((1 / 128, 1 / 64, 0.05, 0))
+        rtt = None if rng.random() < 0.03 else 20 + rng.lognormvariate(0, 0.6) + (40 if rng.random() < 0.01 else 0)
+        window.add(t, rtt)
+        samples.append((t, rtt))
+        if all(r is None for tt, r in samples[-int(span * 128) - 1:] if tt > t - span):
+            continue
+        expected = brute_force(samples, span)
+        actual = window.current()
+        for key, value in expected.items():
+            assert actual[key] == pytest.approx(value, rel=1e-6, abs=1e-6), key
+        # Pire fenêtre : première position pleine au (P99, jitter) maximal
+        if t - samples[0][0] >= span and (worst is None or (expected['p99'], expected['jitter'])
+                                          > (worst['p99'], worst['jitter'])):
+            worst = dict(expected, t=t)
+    assert window.worst['t'] == worst['t']
+    assert window.worst['p99'] == worst['p99']